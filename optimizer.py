@@ -1,24 +1,37 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import functools
+from collections.abc import Callable
+from pathlib import Path
+from typing import Final
+
 from prompt_toolkit import PromptSession as PromptToolkitSession
 from prompt_toolkit.patch_stdout import patch_stdout
 from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from rich.console import Console
+from rich.live import Live
 from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.theme import Theme
 
 from prompt_optimizer.domain.models import OptimizationStep, PromptSession
+from prompt_optimizer.llm.cache import CachingLLMClient
 from prompt_optimizer.llm.client import (
     GeminiLLMClient,
     LLMClient,
     MockLLMClient,
     OpenAILLMClient,
 )
+from prompt_optimizer.llm.semantic_cache import (
+    SemanticLLMCache,
+    load_sentence_embedder,
+)
 from prompt_optimizer.pipelines.harmonizer import GlobalHarmonizer
-from prompt_optimizer.prompts.manager import PromptManager
+from prompt_optimizer.prompts.manager import STATIC_SYSTEM_PREFIX, PromptManager
 from prompt_optimizer.state_machine.engine import PromptOptimizerEngine
 
 
@@ -45,6 +58,12 @@ class AppSettings(BaseSettings):
             "gemini_api_key", "GEMINI_API_KEY", "PROMPT_OPT_GEMINI_API_KEY"
         ),
     )
+    semantic_cache_threshold: float | None = Field(default=None, gt=0.0, le=1.0)
+    semantic_cache_dir: Path | None = None
+    route_analysis_steps: bool = True
+    draft_model: str | None = None
+    request_timeout: float = Field(default=60.0, gt=0.0)
+    max_retries: int = Field(default=1, ge=0)
     primary_color: str = "#7FB3D5"
     accent_color: str = "#82E0AA"
     muted_color: str = "#ABB2B9"
@@ -53,89 +72,236 @@ class AppSettings(BaseSettings):
     error_color: str = "#E6B0AA"
 
 
-def build_console(settings: AppSettings) -> Console:
-    """Create a themed Rich console using a relaxing palette."""
+@functools.lru_cache(maxsize=1)
+def get_settings() -> AppSettings:
+    """Load the application settings once per process."""
+
+    return AppSettings()
+
 
-    theme = Theme(
+@functools.lru_cache(maxsize=8)
+def _build_theme(
+    primary: str, accent: str, muted: str, warning: str, error: str
+) -> Theme:
+    """Create the Rich theme for a palette, shared by every console using it."""
+
+    return Theme(
         {
-            "primary": settings.primary_color,
-            "accent": settings.accent_color,
-            "muted": settings.muted_color,
-            "warning": settings.warning_color,
-            "error": settings.error_color,
-            "success": settings.accent_color,
+            "primary": primary,
+            "accent": accent,
+            "muted": muted,
+            "warning": warning,
+            "error": error,
+            "success": accent,
         }
     )
 
+
+def build_console(settings: AppSettings) -> Console:
+    """Create a themed Rich console using a relaxing palette."""
+
+    theme = _build_theme(
+        settings.primary_color,
+        settings.accent_color,
+        settings.muted_color,
+        settings.warning_color,
+        settings.error_color,
+    )
+
     return Console(theme=theme)
 
+# Smaller siblings that handle the short per-step analysis prompts, leaving
+# harmonization on the selected flagship model.
+_ANALYSIS_MODELS: Final[dict[str, str]] = {
+    "gemini-2.5-flash": "gemini-2.5-flash-lite",
+    "gpt-5": "gpt-5-mini",
+}
+
+
+def _analysis_routing(
+    model_choice: str, settings: AppSettings
+) -> dict[OptimizationStep, str] | None:
+    """Map each analysis step to the smaller model paired with ``model_choice``."""
+
+    analysis_model = _ANALYSIS_MODELS.get(model_choice)
+    if not settings.route_analysis_steps or analysis_model is None:
+        return None
+    return dict.fromkeys(_STEPS_TO_RUN, analysis_model)
+
+
 def build_client(model_choice: str, settings: AppSettings) -> LLMClient:
-    """Instantiate an LLM client based on the user's selection."""
+    """Instantiate an LLM client based on the user's selection.
+
+    Live clients are wrapped in the response caches; the mock is returned as is.
+    """
 
+    client: LLMClient
     if model_choice == "gemini-2.5-flash":
         if not settings.gemini_api_key:
             raise ValueError("Gemini API key not configured.")
-        return GeminiLLMClient(model_choice, api_key=settings.gemini_api_key)
-
-    if model_choice == "gpt-5":
+        client = GeminiLLMClient(
+            model_choice,
+            api_key=settings.gemini_api_key,
+            system_prompt=STATIC_SYSTEM_PREFIX,
+            model_routing=_analysis_routing(model_choice, settings),
+        )
+    elif model_choice == "gpt-5":
         if not settings.openai_api_key:
             raise ValueError("OpenAI API key not configured.")
-        return OpenAILLMClient(model_choice, api_key=settings.openai_api_key)
+        client = OpenAILLMClient(
+            model_choice,
+            api_key=settings.openai_api_key,
+            system_prompt=STATIC_SYSTEM_PREFIX,
+            model_routing=_analysis_routing(model_choice, settings),
+            draft_model=settings.draft_model,
+            request_timeout=settings.request_timeout,
+            max_retries=settings.max_retries,
+        )
+    else:
+        # The mock is deterministic and free, so caching it only adds overhead.
+        return MockLLMClient(mode=model_choice)
+
+    if settings.semantic_cache_threshold is not None:
+        cache_path = (
+            settings.semantic_cache_dir / f"{model_choice}.json"
+            if settings.semantic_cache_dir is not None
+            else None
+        )
+        semantic_cache = SemanticLLMCache(
+            client,
+            embedder=load_sentence_embedder(),
+            threshold=settings.semantic_cache_threshold,
+            path=cache_path,
+        )
+        if cache_path is not None:
+            atexit.register(semantic_cache.save)
+        client = semantic_cache
+
+    return CachingLLMClient(client)
+
+
+_STEPS_TO_RUN: Final[tuple[OptimizationStep, ...]] = (
+    OptimizationStep.USER_INTENT,
+    OptimizationStep.ROLE,
+    OptimizationStep.OBJECTIVE,
+    OptimizationStep.CONTEXT,
+    OptimizationStep.AUDIENCE,
+    OptimizationStep.KEY_POINTS,
+    OptimizationStep.CONSTRAINTS,
+    OptimizationStep.OUTPUT,
+)
 
-    return MockLLMClient(mode=model_choice)
+_REJECTION_INITIALS: Final = frozenset({"n", "N"})
 
+_MODEL_ALIASES: dict[str, str] = {
+    "1": "gemini-2.5-flash",
+    "gemini": "gemini-2.5-flash",
+    "gemini-2.5-flash": "gemini-2.5-flash",
+    "gemini 2.5 flash": "gemini-2.5-flash",
+    "2": "gpt-5",
+    "chatgpt": "gpt-5",
+    "gpt-5": "gpt-5",
+    "gpt5": "gpt-5",
+    "mock": "mock",
+    "dry-run": "mock",
+    "dryrun": "mock",
+}
 
-def _normalize_model_choice(choice: str) -> str | None:
-    """Normalize user input into a supported model identifier."""
 
-    normalized = choice.strip().lower()
+def _is_rejection(answer: str) -> bool:
+    """Return True when a Y/n answer declines, i.e. starts with 'n' or 'N'."""
 
-    if not normalized:
-        return None
+    return answer.lstrip()[:1] in _REJECTION_INITIALS
 
-    if normalized in {"1", "gemini", "gemini-2.5-flash", "gemini 2.5 flash"}:
-        return "gemini-2.5-flash"
 
-    if normalized in {"2", "chatgpt", "gpt-5", "gpt5"}:
-        return "gpt-5"
+def _normalize_model_choice(choice: str) -> str | None:
+    """Normalize user input into a supported model identifier."""
 
-    if normalized in {"mock", "dry-run", "dryrun"}:
-        return "mock"
+    return _MODEL_ALIASES.get(choice.strip().lower())
 
-    return None
 
+async def prompt_for_input(session: PromptToolkitSession, message: str) -> str:
+    """Prompt the user for input.
 
-def prompt_for_input(session: PromptToolkitSession, message: str) -> str:
-    """Prompt the user for input while keeping stdout patched for Rich."""
+    stdout is patched once for the whole CLI run (see ``main``) rather than on
+    every prompt.
+    """
 
-    with patch_stdout():
-        return session.prompt(message)
+    return await session.prompt_async(message)
 
 
-def prompt_for_multiline(session: PromptToolkitSession, message: str) -> str:
+async def prompt_for_multiline(session: PromptToolkitSession, message: str) -> str:
     """Prompt the user for multi-line input."""
 
     lines: list[str] = []
 
-    with patch_stdout():
-        while True:
-            try:
-                prompt_message = message if not lines else "... "
-                line = session.prompt(prompt_message)
-            except EOFError:
-                # Finish input on Ctrl-D even when the buffer is empty.
-                break
+    while True:
+        try:
+            prompt_message = message if not lines else "... "
+            line = await session.prompt_async(prompt_message)
+        except EOFError:
+            # Finish input on Ctrl-D even when the buffer is empty.
+            break
 
-            if line == "":
-                # An empty line ends the multi-line capture.
-                break
+        if line == "":
+            # An empty line ends the multi-line capture.
+            break
 
-            lines.append(line)
+        lines.append(line)
 
     return "\n".join(lines)
 
 
-def select_theme(
+@functools.lru_cache(maxsize=4)
+def _welcome_panel(border_color: str) -> Panel:
+    """Build the welcome banner once per border colour."""
+
+    welcome_message = (
+        "Prompt Optimizer CLI\n"
+        "State Machine: User Intent → Parameters → Harmonization → Final Output"
+    )
+    return Panel.fit(
+        welcome_message,
+        title="[accent]Welcome[/accent]",
+        border_style=border_color,
+        style="primary",
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _model_select_panel(border_color: str) -> Panel:
+    """Build the model menu once per border colour; it is shown every restart."""
+
+    return Panel.fit(
+        "[1] Gemini (gemini-2.5-flash)\n[2] ChatGPT (gpt-5)",
+        title="[accent]Select Model[/accent]",
+        border_style=border_color,
+        style="primary",
+    )
+
+
+def _live_panel_writer(
+    live: Live, title: str, border_style: str
+) -> Callable[[str], None]:
+    """Return a callback that appends streamed text to a live panel."""
+
+    chunks: list[str] = []
+
+    def write(chunk: str) -> None:
+        chunks.append(chunk)
+        live.update(
+            Panel(
+                "".join(chunks),
+                title=title,
+                border_style=border_style,
+                style="primary",
+            )
+        )
+
+    return write
+
+
+async def select_theme(
     settings: AppSettings, session: PromptToolkitSession, console: Console
 ) -> tuple[AppSettings, Console]:
     """Present the theme selector as the first menu and apply the choice."""
@@ -191,8 +357,10 @@ def select_theme(
 
     chosen_option: str | None = None
     while chosen_option is None:
-        selection = prompt_for_input(
-            session, f"Choose a theme [1-{len(theme_options)}]: "
+        selection = (
+            await prompt_for_input(
+                session, f"Choose a theme [1-{len(theme_options)}]: "
+            )
         ).strip() or "1"
 
         if selection in theme_options:
@@ -212,45 +380,41 @@ def select_theme(
     return updated_settings, themed_console
 
 
-def run_cli(settings: AppSettings, console: Console) -> None:
+async def arun_cli(settings: AppSettings, console: Console) -> None:
     """Run the interactive Prompt Optimizer CLI workflow."""
 
-    welcome_message = (
-        "Prompt Optimizer CLI\n"
-        "State Machine: User Intent → Parameters → Harmonization → Final Output"
-    )
-    console.print(
-        Panel.fit(
-            welcome_message,
-            title="[accent]Welcome[/accent]",
-            border_style=settings.border_color,
-            style="primary",
-        )
-    )
+    console.print(_welcome_panel(settings.border_color))
 
     prompt_manager = PromptManager()
     prompt_session: PromptToolkitSession[str] = PromptToolkitSession()
-
-    settings, console = select_theme(settings, prompt_session, console)
+    # Restarted sessions on the same backend share its client (and therefore
+    # its response cache) instead of rebuilding the whole stack.
+    engines: dict[str, PromptOptimizerEngine] = {}
+    harmonizers: dict[str, GlobalHarmonizer] = {}
+
+    settings, console = await select_theme(settings, prompt_session, console)
+
+    # One spinner serves every blocking call; it is restarted with a new
+    # description instead of building a fresh live display each time.
+    progress = Progress(
+        SpinnerColumn(),
+        TextColumn("{task.description}"),
+        transient=True,
+        console=console,
+    )
+    progress_task = progress.add_task("", total=None)
 
     while True:
-        console.print(
-            Panel.fit(
-                "[1] Gemini (gemini-2.5-flash)\n[2] ChatGPT (gpt-5)",
-                title="[accent]Select Model[/accent]",
-                border_style=settings.border_color,
-                style="primary",
-            )
-        )
+        console.print(_model_select_panel(settings.border_color))
 
+        default_choice = _normalize_model_choice(settings.default_model)
         model_choice: str | None = None
         while model_choice is None:
-            raw_choice = prompt_for_input(
-                prompt_session, "Choose a model [1/2]: "
+            raw_choice = (
+                await prompt_for_input(prompt_session, "Choose a model [1/2]: ")
             ).strip()
 
             normalized_choice = _normalize_model_choice(raw_choice)
-            default_choice = _normalize_model_choice(settings.default_model)
 
             model_choice = normalized_choice or default_choice
 
@@ -259,24 +423,47 @@ def run_cli(settings: AppSettings, console: Console) -> None:
                     "[error]Invalid selection. Please choose '1' for Gemini or '2' for ChatGPT.[/error]"
                 )
 
-        try:
-            client = build_client(model_choice, settings)
-        except ValueError as error:
-            console.print(
-                f"[error]{error} Please set the required API key and retry.[/error]\n"
+        if model_choice not in engines:
+            try:
+                client = build_client(model_choice, settings)
+            except ValueError as error:
+                console.print(
+                    f"[error]{error} Please set the required API key "
+                    "and retry.[/error]\n"
+                )
+                continue
+            except ImportError as error:
+                console.print(
+                    f"[warning]{error} Continuing without the semantic "
+                    "cache.[/warning]\n"
+                )
+                client = build_client(
+                    model_choice,
+                    settings.model_copy(update={"semantic_cache_threshold": None}),
+                )
+            engines[model_choice] = PromptOptimizerEngine(
+                prompt_manager=prompt_manager, client=client
             )
-            continue
-        engine = PromptOptimizerEngine(prompt_manager=prompt_manager, client=client)
-        harmonizer = GlobalHarmonizer(prompt_manager=prompt_manager, client=client)
-
-        console.print(
-            f"Using backend mode: [accent]{model_choice}[/accent]\n"
-        )
+            harmonizers[model_choice] = GlobalHarmonizer(
+                prompt_manager=prompt_manager, client=client
+            )
+        engine = engines[model_choice]
+        harmonizer = harmonizers[model_choice]
+
+        backend_note = f"Using backend mode: [accent]{model_choice}[/accent]"
+        if _analysis_routing(model_choice, settings):
+            backend_note += (
+                f" (analysis steps: [accent]{_ANALYSIS_MODELS[model_choice]}"
+                "[/accent])"
+            )
+        console.print(f"{backend_note}\n")
         console.print(
             "[muted]Enter a draft prompt. Finish input with Ctrl-D or an empty line on a new prompt.[/muted]"
         )
-        raw_prompt = prompt_for_multiline(
-            prompt_session, "Draft Prompt (multi-line supported): "
+        raw_prompt = (
+            await prompt_for_multiline(
+                prompt_session, "Draft Prompt (multi-line supported): "
+            )
         ).strip()
 
         if not raw_prompt or raw_prompt.strip().lower() == "exit":
@@ -285,68 +472,68 @@ def run_cli(settings: AppSettings, console: Console) -> None:
 
         session_state = PromptSession(parameters={"draft_prompt": raw_prompt})
 
-        steps_to_run = [
-            OptimizationStep.USER_INTENT,
-            OptimizationStep.ROLE,
-            OptimizationStep.OBJECTIVE,
-            OptimizationStep.CONTEXT,
-            OptimizationStep.AUDIENCE,
-            OptimizationStep.KEY_POINTS,
-            OptimizationStep.CONSTRAINTS,
-            OptimizationStep.OUTPUT,
-        ]
-
-        for step in steps_to_run:
+        # Every section depends only on the draft prompt, so the first round
+        # of suggestions comes from a single batched call; only the sections
+        # the user rejects are regenerated individually.
+        progress.update(
+            progress_task, description=f"Generating {len(_STEPS_TO_RUN)} sections..."
+        )
+        with progress:
+            suggestions = await engine.aprocess_all_steps(
+                session=session_state, user_prompt=raw_prompt, steps=_STEPS_TO_RUN
+            )
+
+        for step, suggestion in zip(_STEPS_TO_RUN, suggestions, strict=True):
+            analysis_result = suggestion
             confirmed = False
-            feedback: str | None = None
 
             while not confirmed:
-                with Progress(
-                    SpinnerColumn(),
-                    TextColumn("{task.description}"),
-                    transient=True,
-                    console=console,
-                ) as progress:
-                    progress.add_task(
-                        f"Generating {step.name.replace('_', ' ').title()}...",
-                        total=None,
-                    )
-                    analysis_result = engine.process_step(
-                        session=session_state,
-                        step=step,
-                        user_prompt=raw_prompt,
-                        feedback=feedback,
-                    )
-
                 console.print(
                     Panel(
                         analysis_result.summary,
-                        title=f"[accent]{step.name.replace('_', ' ').title()}[/accent]",
+                        title=f"[accent]{step.label}[/accent]",
                         subtitle="Accept this suggestion?",
                         border_style=settings.border_color,
                         style="primary",
                     )
                 )
 
-                confirmation = prompt_for_input(prompt_session, "Accept? [Y/n]: ")
-                if confirmation.strip().lower().startswith("n"):
-                    feedback = prompt_for_input(
+                confirmation = await prompt_for_input(
+                    prompt_session, "Accept? [Y/n]: "
+                )
+                if _is_rejection(confirmation):
+                    feedback = await prompt_for_input(
                         prompt_session, "Provide feedback for refinement: "
                     )
+                    title = f"[accent]{step.label}[/accent]"
+                    with Live(
+                        Panel(
+                            "",
+                            title=title,
+                            border_style=settings.border_color,
+                            style="primary",
+                        ),
+                        console=console,
+                        transient=True,
+                    ) as live:
+                        analysis_result = await engine.aprocess_step(
+                            session=session_state,
+                            step=step,
+                            user_prompt=raw_prompt,
+                            feedback=feedback,
+                            on_chunk=_live_panel_writer(
+                                live, title, settings.border_color
+                            ),
+                        )
                     continue
 
-                session_state.parameters[step.value] = analysis_result.summary
+                session_state.set_parameter(step.value, analysis_result.summary)
                 session_state.record_analysis(analysis_result)
                 confirmed = True
 
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("{task.description}"),
-            transient=True,
-            console=console,
-        ) as progress:
-            progress.add_task("Harmonizing final prompt...", total=None)
-            session_state = harmonizer.harmonize(session_state)
+        progress.update(progress_task, description="Harmonizing final prompt...")
+        with progress:
+            session_state = await harmonizer.aharmonize(session_state)
 
         final_prompt = session_state.parameters.get(
             OptimizationStep.FINAL_OUTPUT.value, ""
@@ -360,18 +547,24 @@ def run_cli(settings: AppSettings, console: Console) -> None:
             )
         )
 
-        restart = prompt_for_input(prompt_session, "Restart session? [y/N]: ").strip().lower()
+        restart = (
+            (await prompt_for_input(prompt_session, "Restart session? [y/N]: "))
+            .strip()
+            .lower()
+        )
         if restart not in {"y", "yes"}:
             console.print("\n[muted]Session complete. Goodbye![/muted]")
             return
 
 
 def main() -> None:
-    settings = AppSettings()
+    settings = get_settings()
     console = build_console(settings)
 
     try:
-        run_cli(settings=settings, console=console)
+        # raw=True lets Rich's colour and cursor escape sequences through.
+        with patch_stdout(raw=True):
+            asyncio.run(arun_cli(settings=settings, console=console))
     except KeyboardInterrupt:
         console.print("\n[red]Interrupted by user. Exiting...[/red]")
 
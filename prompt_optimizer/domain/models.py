@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-from datetime import datetime
+import time
+import weakref
+from collections.abc import Mapping
+from datetime import UTC, datetime
 from enum import Enum
+from typing import Any, Self
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 
 class OptimizationStep(str, Enum):
@@ -21,6 +25,22 @@ class OptimizationStep(str, Enum):
     HARMONIZATION = "harmonization"
     FINAL_OUTPUT = "final_output"
 
+    @property
+    def label(self) -> str:
+        """Human-readable title of the step, e.g. ``"Key Points"``."""
+        return _STEP_LABELS[self]
+
+
+_STEP_LABELS: dict[OptimizationStep, str] = {
+    step: step.name.replace("_", " ").title() for step in OptimizationStep
+}
+
+
+def _from_epoch_ns(timestamp_ns: int) -> datetime:
+    """Convert integer nanoseconds since the epoch into an aware UTC datetime."""
+
+    return datetime.fromtimestamp(timestamp_ns / 1e9, tz=UTC)
+
 
 class TokenUsage(BaseModel):
     """Tracks LLM token usage and the associated telemetry data."""
@@ -31,6 +51,8 @@ class TokenUsage(BaseModel):
     completion_tokens: int = Field(default=0, ge=0)
     cached_tokens: int = Field(default=0, ge=0)
     cost_usd: float = Field(default=0.0, ge=0.0)
+    cache_hits: int = Field(default=0, ge=0)
+    cache_misses: int = Field(default=0, ge=0)
 
     @property
     def total_tokens(self) -> int:
@@ -43,28 +65,170 @@ class AnalysisResult(BaseModel):
     step: OptimizationStep
     summary: str
     details: dict[str, str] = Field(default_factory=dict)
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp_ns: int = Field(default_factory=time.time_ns)
+
+    @property
+    def timestamp(self) -> datetime:
+        return _from_epoch_ns(self.timestamp_ns)
+
+
+class _TrackedParameters(dict[str, str]):
+    """A ``dict`` whose in-place writes bump the owning session's version."""
+
+    __slots__ = ("_session",)
+
+    def __init__(self, session: PromptSession, values: Mapping[str, str]) -> None:
+        super().__init__(values)
+        self._session = weakref.ref(session)
+
+    def _changed(self) -> None:
+        session = self._session()
+        if session is not None:
+            session._touch()
+
+    def __setitem__(self, key: str, value: str) -> None:
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other: Any) -> Self:  # type: ignore[override, misc]
+        super().__ior__(other)
+        self._changed()
+        return self
+
+    def clear(self) -> None:
+        super().clear()
+        self._changed()
+
+    def pop(self, *args: Any, **kwargs: Any) -> Any:
+        value = super().pop(*args, **kwargs)
+        self._changed()
+        return value
+
+    def popitem(self) -> tuple[str, str]:
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def setdefault(self, *args: Any, **kwargs: Any) -> Any:
+        value = super().setdefault(*args, **kwargs)
+        self._changed()
+        return value
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def __reduce__(self) -> tuple[type[dict[str, str]], tuple[dict[str, str]]]:
+        # Copies and pickles hold a plain dict; the session wraps it again.
+        return dict, (dict(self),)
 
 
 class PromptSession(BaseModel):
     """Captures the ongoing state and history of a user's optimization session."""
 
+    # The session is mutated in place on every step; inputs are validated when
+    # the session is built, not on each attribute assignment.
+    model_config = ConfigDict(validate_assignment=False)
+
     session_id: UUID = Field(default_factory=uuid4)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at_ns: int = Field(default_factory=time.time_ns)
     current_step: OptimizationStep = OptimizationStep.USER_INTENT
     completed_steps: list[OptimizationStep] = Field(default_factory=list)
     parameters: dict[str, str] = Field(default_factory=dict)
+    # Runtime setting, kept out of the serialized state and prompts.
+    keep_full_history: bool = Field(default=False, exclude=True)
     analysis_history: list[AnalysisResult] = Field(default_factory=list)
+    last_analysis: AnalysisResult | None = None
     token_usage: TokenUsage | None = None
 
+    _completed_set: set[OptimizationStep] = PrivateAttr(default_factory=set)
+    _version: int = PrivateAttr(default=0)
+
+    def model_post_init(self, context: object, /) -> None:
+        self._reindex()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in type(self).model_fields:
+            if name == "parameters":
+                value = _TrackedParameters(self, value)
+            self._touch()
+        super().__setattr__(name, value)
+
+    # Mutable, so unhashable like any non-frozen model.
+    __hash__ = None  # type: ignore[assignment]
+
+    def __eq__(self, other: object) -> bool:
+        # The version and step index are bookkeeping; equal fields are equal state.
+        if not isinstance(other, PromptSession):
+            return NotImplemented
+        return type(self) is type(other) and self.__dict__ == other.__dict__
+
+    def __copy__(self) -> Self:
+        copied = super().__copy__()
+        copied._reindex()
+        return copied
+
+    def __deepcopy__(self, memo: dict[int, Any] | None = None) -> Self:
+        copied = super().__deepcopy__(memo)
+        copied._reindex()
+        return copied
+
+    def __setstate__(self, state: dict[Any, Any]) -> None:
+        super().__setstate__(state)
+        self._reindex()
+
+    def model_copy(
+        self, *, update: Mapping[str, Any] | None = None, deep: bool = False
+    ) -> Self:
+        # ``update`` is written straight into the copy's fields.
+        copied = super().model_copy(update=update, deep=deep)
+        copied._reindex()
+        return copied
+
+    @property
+    def created_at(self) -> datetime:
+        return _from_epoch_ns(self.created_at_ns)
+
+    @property
+    def version(self) -> int:
+        """Counter bumped by every change to the session's fields."""
+        return self._version
+
     @property
     def is_complete(self) -> bool:
         return self.current_step == OptimizationStep.FINAL_OUTPUT
 
+    def set_parameter(self, key: str, value: str) -> None:
+        """Store a collected parameter; same as ``parameters[key] = value``."""
+        self.parameters[key] = value
+
     def record_analysis(self, result: AnalysisResult) -> None:
-        """Append an analysis result and advance tracking metadata."""
-        self.analysis_history.append(result)
-        if result.step not in self.completed_steps:
+        """Record an analysis result and advance tracking metadata.
+
+        Only the latest result is retained unless ``keep_full_history`` is set,
+        which keeps long-running or batch sessions from growing without bound.
+        """
+        self._touch()
+        self.last_analysis = result
+        if self.keep_full_history:
+            self.analysis_history.append(result)
+        if result.step not in self._completed_set:
+            self._completed_set.add(result.step)
             self.completed_steps.append(result.step)
         self.current_step = result.step
 
+    def _touch(self) -> None:
+        self._version += 1
+
+    def _reindex(self) -> None:
+        """Rebuild the derived state after construction, copying or unpickling.
+
+        Tracks in-place writes to ``parameters`` and indexes the completed
+        steps for O(1) membership.
+        """
+        self.__dict__["parameters"] = _TrackedParameters(self, self.parameters)
+        self._completed_set = set(self.completed_steps)
@@ -0,0 +1,237 @@
+"""Response caching layers for LLM clients."""
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Protocol
+
+from prompt_optimizer.domain.models import OptimizationStep, TokenUsage
+from prompt_optimizer.llm.client import LLMClient
+
+
+class CacheBackend(Protocol):
+    """Minimal key/value store contract used by ``CachingLLMClient``."""
+
+    def get(self, key: bytes) -> str | None:
+        """Return the cached value for ``key`` or ``None`` when absent."""
+
+    def set(self, key: bytes, value: str, ttl: float | None = None) -> None:
+        """Store ``value`` under ``key``, expiring after ``ttl`` seconds."""
+
+
+class InMemoryCacheBackend:
+    """Bounded LRU store with optional per-entry expiry.
+
+    When full, the least recently used fifth of the entries is evicted in one
+    pass so inserts do not pay for an eviction each time.
+    """
+
+    def __init__(self, max_entries: int = 500) -> None:
+        self._max_entries = max_entries
+        self._evict_count = max(1, max_entries // 5)
+        self._entries: OrderedDict[bytes, tuple[str, float | None]] = OrderedDict()
+
+    def get(self, key: bytes) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: bytes, value: str, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self._max_entries:
+            for _ in range(self._evict_count):
+                self._entries.popitem(last=False)
+
+
+class CachingLLMClient(LLMClient):
+    """Memoize responses of another client keyed by model, step, and prompt."""
+
+    def __init__(
+        self,
+        inner: LLMClient,
+        backend: CacheBackend | None = None,
+        ttl: float | None = 3600.0,
+    ) -> None:
+        self.mode = inner.mode
+        self._inner = inner
+        self._backend = backend if backend is not None else InMemoryCacheBackend()
+        self._ttl = ttl
+        self._hits = 0
+        self._misses = 0
+
+    def generate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        key = self._cache_key(prompt, step)
+        cached = None if bypass_cache else self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = self._inner.generate(prompt, step=step, bypass_cache=bypass_cache)
+        self._backend.set(key, response, ttl=self._ttl)
+        return response
+
+    async def agenerate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        key = self._cache_key(prompt, step)
+        cached = None if bypass_cache else self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = await self._inner.agenerate(
+            prompt, step=step, bypass_cache=bypass_cache
+        )
+        self._backend.set(key, response, ttl=self._ttl)
+        return response
+
+    def generate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> Iterator[str]:
+        key = self._cache_key(prompt, step)
+        cached = None if bypass_cache else self._lookup(key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks: list[str] = []
+        for chunk in self._inner.generate_stream(
+            prompt, step=step, bypass_cache=bypass_cache
+        ):
+            chunks.append(chunk)
+            yield chunk
+        # Only fully drained streams are stored; abandoned ones are partial.
+        self._backend.set(key, "".join(chunks), ttl=self._ttl)
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> AsyncIterator[str]:
+        key = self._cache_key(prompt, step)
+        cached = None if bypass_cache else self._lookup(key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks: list[str] = []
+        async for chunk in self._inner.agenerate_stream(
+            prompt, step=step, bypass_cache=bypass_cache
+        ):
+            chunks.append(chunk)
+            yield chunk
+        # Only fully drained streams are stored; abandoned ones are partial.
+        self._backend.set(key, "".join(chunks), ttl=self._ttl)
+
+    def generate_batch(
+        self,
+        prompts: Sequence[str],
+        steps: Sequence[OptimizationStep | None],
+    ) -> list[str]:
+        keys = [
+            self._cache_key(prompt, step)
+            for prompt, step in zip(prompts, steps, strict=True)
+        ]
+        responses = [self._lookup(key) for key in keys]
+        pending = [index for index, cached in enumerate(responses) if cached is None]
+        if pending:
+            # Only the misses go to the backend, still as a single batch.
+            fresh = self._inner.generate_batch(
+                [prompts[index] for index in pending],
+                [steps[index] for index in pending],
+            )
+            for index, response in zip(pending, fresh, strict=True):
+                self._backend.set(keys[index], response, ttl=self._ttl)
+                responses[index] = response
+        return [response or "" for response in responses]
+
+    def generate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        key = self._cache_key(prompt, None, fields)
+        cached = None if bypass_cache else self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = self._inner.generate_json(
+            prompt, fields, bypass_cache=bypass_cache
+        )
+        self._backend.set(key, response, ttl=self._ttl)
+        return response
+
+    async def agenerate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        key = self._cache_key(prompt, None, fields)
+        cached = None if bypass_cache else self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = await self._inner.agenerate_json(
+            prompt, fields, bypass_cache=bypass_cache
+        )
+        self._backend.set(key, response, ttl=self._ttl)
+        return response
+
+    def get_token_usage(self) -> TokenUsage:
+        usage = self._inner.get_token_usage()
+        return usage.model_copy(
+            update={
+                "cache_hits": usage.cache_hits + self._hits,
+                "cache_misses": usage.cache_misses + self._misses,
+            }
+        )
+
+    def _cache_key(
+        self,
+        prompt: str,
+        step: OptimizationStep | None,
+        fields: Sequence[str] | None = None,
+    ) -> bytes:
+        """Return the raw SHA-256 digest identifying this exact request."""
+
+        digest = hashlib.sha256()
+        for part in (
+            self.mode,
+            step.value if step else "",
+            "\x1f".join(fields) if fields is not None else "",
+            prompt,
+        ):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.digest()
+
+    def _lookup(self, key: bytes) -> str | None:
+        cached = self._backend.get(key)
+        if cached is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return cached
@@ -1,12 +1,237 @@
 from __future__ import annotations
 
 import abc
+import asyncio
+import functools
+import hashlib
+import json
+import math
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator, Mapping, Sequence
+from http import HTTPStatus
+from typing import TYPE_CHECKING, TypeVar
 
 import google.generativeai as genai
-from openai import OpenAI
+from google.generativeai.generative_models import GenerativeModel
+from google.generativeai.types.generation_types import (
+    BaseGenerateContentResponse,
+    GenerationConfigDict,
+)
+from openai import APIError, AsyncOpenAI, OpenAI, Timeout
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionMessageParam
+from openai.types.shared_params import ResponseFormatJSONSchema
 
 from prompt_optimizer.domain.models import OptimizationStep, TokenUsage
 
+if TYPE_CHECKING:
+    # Annotation only, so old openai releases without it still import.
+    from openai import DefaultAsyncHttpxClient
+
+# Rule-of-thumb ratio for English text with BPE tokenizers.
+_CHARS_PER_TOKEN = 4
+
+# Input-token limits checked before a request is sent; unknown models skip it.
+_INPUT_TOKEN_LIMITS: dict[str, int] = {
+    "gpt-5": 272_000,
+    "gpt-5-mini": 272_000,
+}
+
+
+class PromptTooLargeError(ValueError):
+    """Raised when a prompt cannot fit in the model's input window."""
+
+
+@functools.lru_cache(maxsize=4)
+def _token_counter(encoding_name: str) -> Callable[[str], int] | None:
+    """Return a tiktoken-based counter, or ``None`` when none can be loaded.
+
+    tiktoken downloads encodings on first use, so a missing package and a
+    failed download (for example when offline) both fall back to the heuristic.
+    """
+
+    try:
+        import tiktoken  # type: ignore[import-not-found, unused-ignore]  # noqa: PLC0415
+    except ImportError:
+        return None
+
+    try:
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception:
+        return None
+
+    def count(text: str) -> int:
+        return len(encoding.encode_ordinary(text))
+
+    return count
+
+
+def _count_tokens(text: str, encoding_name: str) -> int:
+    """Count tokens with tiktoken, falling back to the character heuristic."""
+
+    counter = _token_counter(encoding_name)
+    if counter is None:
+        return len(text) // _CHARS_PER_TOKEN
+    return counter(text)
+
+
+_JSON_GENERATION_CONFIG: GenerationConfigDict = {
+    "response_mime_type": "application/json"
+}
+
+
+def _accumulate_usage(
+    total: TokenUsage,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+) -> TokenUsage:
+    """Return ``total`` extended with the token counts of one more call."""
+
+    return total.model_copy(
+        update={
+            "prompt_tokens": total.prompt_tokens + prompt_tokens,
+            "completion_tokens": total.completion_tokens + completion_tokens,
+            "cached_tokens": total.cached_tokens + cached_tokens,
+        }
+    )
+
+
+_BATCH_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+
+# Process-wide SDK clients, so every LLM client with the same credentials
+# reuses one connection pool (and its TCP/TLS sessions) and setup.
+_registry_lock = threading.Lock()
+_openai_clients: dict[tuple[str, float, int], OpenAI] = {}
+_gemini_models: dict[tuple[str, str, str | None], GenerativeModel] = {}
+_gemini_configured_key: dict[str, str] = {}
+
+
+# Connection attempts fail fast; ``request_timeout`` bounds everything else.
+_CONNECT_TIMEOUT = 5.0
+
+
+def _shared_openai_client(
+    api_key: str, request_timeout: float, max_retries: int
+) -> OpenAI:
+    """Return the process-wide sync OpenAI client for these settings."""
+
+    key = (api_key, request_timeout, max_retries)
+    with _registry_lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            client = _openai_clients[key] = OpenAI(
+                api_key=api_key,
+                timeout=Timeout(request_timeout, connect=_CONNECT_TIMEOUT),
+                max_retries=max_retries,
+            )
+        return client
+
+
+def _shared_gemini_model(
+    model: str, api_key: str, system_prompt: str | None
+) -> GenerativeModel:
+    """Return the process-wide ``GenerativeModel`` for this configuration.
+
+    ``genai.configure`` replaces global state, so it only runs when the key
+    differs from the one last configured.
+    """
+
+    key = (model, api_key, system_prompt)
+    with _registry_lock:
+        if _gemini_configured_key.get("api_key") != api_key:
+            genai.configure(api_key=api_key)
+            _gemini_configured_key["api_key"] = api_key
+        generative_model = _gemini_models.get(key)
+        if generative_model is None:
+            generative_model = _gemini_models[key] = GenerativeModel(
+                model, system_instruction=system_prompt
+            )
+        return generative_model
+
+
+# Analysis steps may be answered by a draft model; harmonization may not.
+_DRAFTABLE_STEPS = frozenset(OptimizationStep) - {
+    OptimizationStep.HARMONIZATION,
+    OptimizationStep.FINAL_OUTPUT,
+}
+_DRAFTABLE_FIELDS = frozenset(step.value for step in _DRAFTABLE_STEPS)
+
+
+def _mean_logprob(completion: ChatCompletion) -> float:
+    """Return the mean token log-probability of the first choice.
+
+    Completions without log-probabilities score negative infinity.
+    """
+
+    logprobs = completion.choices[0].logprobs if completion.choices else None
+    tokens = logprobs.content if logprobs else None
+    if not tokens:
+        return -math.inf
+    return sum(token.logprob for token in tokens) / len(tokens)
+
+
+def _aiohttp_http_client() -> DefaultAsyncHttpxClient | None:
+    """Return an aiohttp-backed HTTP client for ``AsyncOpenAI`` when available.
+
+    httpx's async connection pool degrades under many concurrent requests, so
+    the aiohttp transport is preferred whenever the ``aiohttp`` extra is
+    installed. ``None`` lets the SDK fall back to its default client.
+    """
+
+    try:
+        from openai import DefaultAioHttpClient  # noqa: PLC0415
+    except ImportError:
+        return None
+
+    try:
+        return DefaultAioHttpClient()
+    except RuntimeError:
+        # openai exposes a placeholder that raises when aiohttp is missing.
+        return None
+
+
+_RouteT = TypeVar("_RouteT")
+
+
+# A TypeVar rather than PEP 695 syntax: the package still supports 3.11.
+def _shared_route(  # noqa: UP047
+    routes: Mapping[OptimizationStep | None, _RouteT], fields: Sequence[str]
+) -> _RouteT | None:
+    """Return the route shared by all ``fields`` when each one names a step.
+
+    Batched JSON calls carry their steps as field names; they follow the step
+    routing only when every field is routed to the same target.
+    """
+
+    by_value = {step.value: route for step, route in routes.items() if step}
+    targets = [by_value.get(field) for field in fields]
+    if not targets or targets[0] is None:
+        return None
+    if any(target != targets[0] for target in targets[1:]):
+        return None
+    return targets[0]
+
+
+def _json_schema_format(fields: Sequence[str]) -> ResponseFormatJSONSchema:
+    """Build a strict JSON schema requiring one string property per field."""
+
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "step_suggestions",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {field: {"type": "string"} for field in fields},
+                "required": list(fields),
+                "additionalProperties": False,
+            },
+        },
+    }
+
 
 class LLMClient(abc.ABC):
     """Abstract base class describing the minimum LLM client contract."""
@@ -14,8 +239,101 @@ class LLMClient(abc.ABC):
     mode: str
 
     @abc.abstractmethod
-    def generate(self, prompt: str, step: OptimizationStep | None = None) -> str:
-        """Produce a response for the provided prompt."""
+    def generate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        """Produce a response for the provided prompt.
+
+        ``bypass_cache`` asks caching layers to skip lookups and always hit the
+        backend; clients without a cache ignore it.
+        """
+
+    async def agenerate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        """Asynchronously produce a response for the provided prompt.
+
+        Clients without a native async transport fall back to running
+        ``generate`` in a worker thread so callers can still fan out requests.
+        """
+
+        return await asyncio.to_thread(
+            self.generate, prompt, step, bypass_cache=bypass_cache
+        )
+
+    def generate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> Iterator[str]:
+        """Yield the response incrementally as the backend produces it.
+
+        Clients without native streaming yield the full response once.
+        """
+
+        yield self.generate(prompt, step, bypass_cache=bypass_cache)
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> AsyncIterator[str]:
+        """Asynchronously yield the response as the backend produces it.
+
+        Clients without native streaming yield the full response once.
+        """
+
+        yield await self.agenerate(prompt, step, bypass_cache=bypass_cache)
+
+    def generate_batch(
+        self,
+        prompts: Sequence[str],
+        steps: Sequence[OptimizationStep | None],
+    ) -> list[str]:
+        """Produce responses for independent prompts, in the order given.
+
+        Backends with an offline batch endpoint submit every prompt as one job,
+        trading latency for throughput and cost; the default simply calls
+        ``generate`` for each prompt.
+        """
+
+        return [
+            self.generate(prompt, step)
+            for prompt, step in zip(prompts, steps, strict=True)
+        ]
+
+    def generate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        """Produce a JSON object mapping each of ``fields`` to a string.
+
+        The prompt itself must ask for that object; backends with a native JSON
+        mode additionally enforce the shape. The raw text is returned so the
+        caller decides how to handle malformed output.
+        """
+
+        return self.generate(prompt, bypass_cache=bypass_cache)
+
+    async def agenerate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        """Asynchronously produce a JSON object mapping ``fields`` to strings."""
+
+        return await asyncio.to_thread(
+            self.generate_json, prompt, fields, bypass_cache=bypass_cache
+        )
 
     @abc.abstractmethod
     def get_token_usage(self) -> TokenUsage:
@@ -23,101 +341,545 @@ class LLMClient(abc.ABC):
 
 
 class MockLLMClient(LLMClient):
-    """Deterministic, offline implementation for dry-run and testing flows."""
+    """Deterministic, offline implementation for dry-run and testing flows.
+
+    Prompt tokens are estimated at four characters per token. With
+    ``exact_token_counts`` they are counted with tiktoken when it is
+    installed, which downloads the encoding on first use.
+    """
 
-    def __init__(self, mode: str = "dry-run") -> None:
+    def __init__(
+        self, mode: str = "dry-run", *, exact_token_counts: bool = False
+    ) -> None:
         self.mode = mode
+        self._exact_token_counts = exact_token_counts
         self._prompt_tokens = 0
         self._completion_tokens = 0
         self._cached_tokens = 0
+        self._usage_lock = threading.Lock()
+
+    def generate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        self._record_usage(prompt)
 
-    def generate(self, prompt: str, step: OptimizationStep | None = None) -> str:
-        prompt_tokens = len(prompt.split())
+        step_label = step.value if step else "general"
+        return self._mock_response(step_label)
+
+    def generate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        self._record_usage(prompt)
+
+        return json.dumps({field: self._mock_response(field) for field in fields})
+
+    def _record_usage(self, prompt: str) -> None:
+        prompt_tokens = (
+            _count_tokens(prompt, "cl100k_base")
+            if self._exact_token_counts
+            else len(prompt) // _CHARS_PER_TOKEN
+        )
         completion_tokens = max(1, prompt_tokens // 2)
 
-        self._prompt_tokens += prompt_tokens
-        self._completion_tokens += completion_tokens
+        with self._usage_lock:
+            self._prompt_tokens += prompt_tokens
+            self._completion_tokens += completion_tokens
 
+    @staticmethod
+    def _mock_response(label: str) -> str:
         prefix = "[MOCK]"
-        step_label = step.value if step else "general"
-        return (
-            f"{prefix} Response for {step_label}: "
-            "synthesized output based on prompt."
-        )
+        return f"{prefix} Response for {label}: synthesized output based on prompt."
 
     def get_token_usage(self) -> TokenUsage:
-        return TokenUsage(
-            prompt_tokens=self._prompt_tokens,
-            completion_tokens=self._completion_tokens,
-            cached_tokens=self._cached_tokens,
-            cost_usd=0.0,
-        )
+        with self._usage_lock:
+            return TokenUsage(
+                prompt_tokens=self._prompt_tokens,
+                completion_tokens=self._completion_tokens,
+                cached_tokens=self._cached_tokens,
+                cost_usd=0.0,
+            )
 
 
 class OpenAILLMClient(LLMClient):
-    """OpenAI-powered client for live GPT-style generations."""
-
-    def __init__(self, model: str, api_key: str) -> None:
+    """OpenAI-powered client for live GPT-style generations.
+
+    A ``system_prompt`` is sent ahead of every user message together with a
+    ``prompt_cache_key`` derived from it, so requests sharing that prefix are
+    routed to the same prompt cache. ``model_routing`` sends the listed steps
+    to other (typically smaller) models; every other call uses ``model``.
+
+    With a ``draft_model``, async analysis calls (plain, streamed, and JSON
+    calls whose fields are all analysis steps) also race a draft from that
+    model against the regular request. The draft is returned, and the regular
+    request cancelled, when its mean token log-probability reaches
+    ``draft_min_logprob``. Streamed calls then yield the answer in one chunk.
+    The draft model must support ``logprobs``.
+    """
+
+    batch_poll_interval: float = 10.0
+    # Seconds generate_batch waits before cancelling the job; the API itself
+    # allows up to the full 24h completion window.
+    batch_max_wait: float = 3600.0
+
+    def __init__(  # noqa: PLR0913
+        self,
+        model: str,
+        api_key: str,
+        system_prompt: str | None = None,
+        model_routing: Mapping[OptimizationStep, str] | None = None,
+        *,
+        draft_model: str | None = None,
+        draft_min_logprob: float = -0.3,
+        request_timeout: float = 60.0,
+        max_retries: int = 1,
+    ) -> None:
         self.mode = model
         self._model = model
-        self._client = OpenAI(api_key=api_key)
+        self._draft_model = draft_model
+        self._draft_min_logprob = draft_min_logprob
+        self._models: dict[OptimizationStep | None, str] = dict(
+            (model_routing or {}).items()
+        )
+        self._input_token_limit = _INPUT_TOKEN_LIMITS.get(model)
+        # Built once; each request only appends its own user message.
+        self._message_prefix: tuple[ChatCompletionMessageParam, ...] = (
+            ({"role": "system", "content": system_prompt},)
+            if system_prompt is not None
+            else ()
+        )
+        self._extra_body: dict[str, str] = {}
+        if system_prompt is not None:
+            prefix_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+            self._extra_body["prompt_cache_key"] = prefix_hash[:32]
+        self._client = _shared_openai_client(api_key, request_timeout, max_retries)
+        # Async clients hold connections bound to the loop that opened them,
+        # so they are not shared between instances.
+        self._aclient = AsyncOpenAI(
+            api_key=api_key,
+            http_client=_aiohttp_http_client(),
+            timeout=Timeout(request_timeout, connect=_CONNECT_TIMEOUT),
+            max_retries=max_retries,
+        )
         self._usage = TokenUsage()
-
-    def generate(self, prompt: str, step: OptimizationStep | None = None) -> str:
+        self._usage_lock = threading.Lock()
+
+    def generate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
         response = self._client.chat.completions.create(
-            model=self._model,
-            messages=[{"role": "user", "content": prompt}],
+            model=self._models.get(step, self._model),
+            messages=self._build_messages(prompt),
+            extra_body=self._extra_body,
+        )
+        return self._consume_response(response)
+
+    async def agenerate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        model = self._models.get(step, self._model)
+        if self._draft_model is not None and step in _DRAFTABLE_STEPS:
+            return await self._agenerate_with_draft(prompt, model, self._draft_model)
+
+        response = await self._aclient.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt),
+            extra_body=self._extra_body,
+        )
+        return self._consume_response(response)
+
+    def generate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> Iterator[str]:
+        stream = self._client.chat.completions.create(
+            model=self._models.get(step, self._model),
+            messages=self._build_messages(prompt),
+            extra_body=self._extra_body,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            # With include_usage the final chunk carries usage and no choices.
+            if chunk.usage is not None:
+                self._record_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> AsyncIterator[str]:
+        model = self._models.get(step, self._model)
+        if self._draft_model is not None and step in _DRAFTABLE_STEPS:
+            yield await self._agenerate_with_draft(prompt, model, self._draft_model)
+            return
+
+        stream = await self._aclient.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt),
+            extra_body=self._extra_body,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            # With include_usage the final chunk carries usage and no choices.
+            if chunk.usage is not None:
+                self._record_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def generate_batch(
+        self,
+        prompts: Sequence[str],
+        steps: Sequence[OptimizationStep | None],
+    ) -> list[str]:
+        """Submit the prompts as one Batch API job and wait for its results.
+
+        Raises:
+            RuntimeError: If the batch does not complete or omits a response.
+            TimeoutError: If the batch is still running after
+                ``batch_max_wait`` seconds; the job is cancelled first.
+        """
+
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": str(index),
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self._models.get(step, self._model),
+                        "messages": self._build_messages(prompt),
+                        **self._extra_body,
+                    },
+                }
+            )
+            for index, (prompt, step) in enumerate(zip(prompts, steps, strict=True))
+        ]
+        batch_input = self._client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = self._client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        deadline = time.monotonic() + self.batch_max_wait
+        while batch.status not in _BATCH_FINAL_STATUSES:
+            if time.monotonic() >= deadline:
+                self._client.batches.cancel(batch.id)
+                raise TimeoutError(
+                    f"OpenAI batch {batch.id} did not finish within "
+                    f"{self.batch_max_wait:g} seconds and was cancelled."
+                )
+            time.sleep(self.batch_poll_interval)
+            batch = self._client.batches.retrieve(batch.id)
+
+        if batch.status != "completed" or batch.output_file_id is None:
+            raise RuntimeError(f"OpenAI batch {batch.id} ended as {batch.status}.")
+
+        responses: dict[str, str] = {}
+        output = self._client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == HTTPStatus.OK:
+                completion = ChatCompletion.model_validate(response["body"])
+                responses[record["custom_id"]] = self._consume_response(completion)
+
+        custom_ids = [str(index) for index in range(len(lines))]
+        missing = [custom_id for custom_id in custom_ids if custom_id not in responses]
+        if missing:
+            raise RuntimeError(
+                f"OpenAI batch {batch.id} returned no response for requests "
+                f"{', '.join(missing)}."
+            )
+        return [responses[custom_id] for custom_id in custom_ids]
+
+    def generate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        response = self._client.chat.completions.create(
+            model=_shared_route(self._models, fields) or self._model,
+            messages=self._build_messages(prompt),
+            response_format=_json_schema_format(fields),
+            extra_body=self._extra_body,
+        )
+        return self._consume_response(response)
+
+    async def agenerate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        model = _shared_route(self._models, fields) or self._model
+        response_format = _json_schema_format(fields)
+        if self._draft_model is not None and _DRAFTABLE_FIELDS.issuperset(fields):
+            return await self._agenerate_with_draft(
+                prompt, model, self._draft_model, response_format=response_format
+            )
+
+        response = await self._aclient.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt),
+            response_format=response_format,
+            extra_body=self._extra_body,
+        )
+        return self._consume_response(response)
+
+    def _build_messages(self, prompt: str) -> list[ChatCompletionMessageParam]:
+        """Place the static system prompt first so it forms a stable prefix.
+
+        Raises:
+            PromptTooLargeError: If the prompt exceeds the model's input limit.
+        """
+
+        self._check_prompt_size(prompt)
+        return [*self._message_prefix, {"role": "user", "content": prompt}]
+
+    async def _agenerate_with_draft(
+        self,
+        prompt: str,
+        model: str,
+        draft_model: str,
+        *,
+        response_format: ResponseFormatJSONSchema | None = None,
+    ) -> str:
+        """Race a draft answer against ``model`` and keep it when confident."""
+
+        messages = self._build_messages(prompt)
+        verify_task = asyncio.create_task(
+            self._acreate(model, messages, response_format)
+        )
+        try:
+            try:
+                draft = await self._acreate(
+                    draft_model, messages, response_format, logprobs=True
+                )
+            except APIError:
+                return self._consume_response(await verify_task)
+
+            if _mean_logprob(draft) >= self._draft_min_logprob:
+                # A verification call that already finished was billed too.
+                if (
+                    verify_task.done()
+                    and not verify_task.cancelled()
+                    and verify_task.exception() is None
+                ):
+                    self._record_usage(verify_task.result().usage)
+                return self._consume_response(draft)
+            # The rejected draft was still billed.
+            self._record_usage(draft.usage)
+            return self._consume_response(await verify_task)
+        finally:
+            # No-op once the verification call has finished.
+            verify_task.cancel()
+
+    async def _acreate(
+        self,
+        model: str,
+        messages: list[ChatCompletionMessageParam],
+        response_format: ResponseFormatJSONSchema | None,
+        *,
+        logprobs: bool = False,
+    ) -> ChatCompletion:
+        # Only pass response_format when set; its "unset" sentinel differs
+        # between openai releases.
+        if response_format is None:
+            return await self._aclient.chat.completions.create(
+                model=model,
+                messages=messages,
+                extra_body=self._extra_body,
+                logprobs=logprobs,
+            )
+        return await self._aclient.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format=response_format,
+            extra_body=self._extra_body,
+            logprobs=logprobs,
         )
 
-        message = response.choices[0].message.content or ""
-        usage = response.usage
+    def _check_prompt_size(self, prompt: str) -> None:
+        """Fail fast instead of sending a request the API would reject."""
 
-        prompt_tokens = usage.prompt_tokens if usage else 0
-        completion_tokens = usage.completion_tokens if usage else 0
+        limit = self._input_token_limit
+        # A token spans at least one character, so short prompts need no count.
+        if limit is None or len(prompt) <= limit:
+            return
+        prompt_tokens = _count_tokens(prompt, "o200k_base")
+        if prompt_tokens > limit:
+            raise PromptTooLargeError(
+                f"Prompt has {prompt_tokens} tokens; {self._model} accepts {limit}."
+            )
 
-        self._usage = TokenUsage(
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            cached_tokens=0,
-            cost_usd=0.0,
-        )
+    def _consume_response(self, response: ChatCompletion) -> str:
+        """Extract the message text and refresh usage from a chat completion."""
+
+        message = response.choices[0].message.content or ""
+        self._record_usage(response.usage)
 
         return message
 
+    def _record_usage(self, usage: CompletionUsage | None) -> None:
+        if usage is None:
+            return
+        details = usage.prompt_tokens_details
+        cached_tokens = (details.cached_tokens or 0) if details else 0
+
+        with self._usage_lock:
+            self._usage = _accumulate_usage(
+                self._usage,
+                # OpenAI counts cache hits inside prompt_tokens; split them out.
+                prompt_tokens=usage.prompt_tokens - cached_tokens,
+                completion_tokens=usage.completion_tokens,
+                cached_tokens=cached_tokens,
+            )
+
     def get_token_usage(self) -> TokenUsage:
-        return self._usage
+        with self._usage_lock:
+            return self._usage
 
 
 class GeminiLLMClient(LLMClient):
-    """Gemini-powered client for Google Generative AI models."""
-
-    def __init__(self, model: str, api_key: str) -> None:
+    """Gemini-powered client for Google Generative AI models.
+
+    ``model_routing`` sends the listed steps to other (typically smaller)
+    models; every other call uses ``model``.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        api_key: str,
+        system_prompt: str | None = None,
+        model_routing: Mapping[OptimizationStep, str] | None = None,
+    ) -> None:
         self.mode = model
         self._model = model
         self._usage = TokenUsage()
-        genai.configure(api_key=api_key)
-        self._client = genai.GenerativeModel(model)
+        self._usage_lock = threading.Lock()
+        self._client = _shared_gemini_model(model, api_key, system_prompt)
+        self._routed_clients: dict[OptimizationStep | None, GenerativeModel] = {
+            step: _shared_gemini_model(routed_model, api_key, system_prompt)
+            for step, routed_model in (model_routing or {}).items()
+        }
+
+    def generate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        response = self._client_for(step).generate_content(prompt)
+        return self._consume_response(response)
+
+    async def agenerate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        response = await self._client_for(step).generate_content_async(prompt)
+        return self._consume_response(response)
+
+    def generate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> Iterator[str]:
+        response = self._client_for(step).generate_content(prompt, stream=True)
+        for chunk in response:
+            yield chunk.text
+        # Usage metadata is only final once the stream has been drained.
+        self._record_usage(response)
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> AsyncIterator[str]:
+        response = await self._client_for(step).generate_content_async(
+            prompt, stream=True
+        )
+        async for chunk in response:
+            yield chunk.text
+        # Usage metadata is only final once the stream has been drained.
+        self._record_usage(response)
+
+    def generate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        client = _shared_route(self._routed_clients, fields) or self._client
+        response = client.generate_content(
+            prompt, generation_config=_JSON_GENERATION_CONFIG
+        )
+        return self._consume_response(response)
+
+    async def agenerate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        client = _shared_route(self._routed_clients, fields) or self._client
+        response = await client.generate_content_async(
+            prompt, generation_config=_JSON_GENERATION_CONFIG
+        )
+        return self._consume_response(response)
+
+    def _client_for(self, step: OptimizationStep | None) -> GenerativeModel:
+        """Return the model client routed for ``step``."""
+
+        return self._routed_clients.get(step, self._client)
 
-    def generate(self, prompt: str, step: OptimizationStep | None = None) -> str:
-        response = self._client.generate_content(prompt)
+    def _consume_response(self, response: BaseGenerateContentResponse) -> str:
+        """Extract the response text and refresh usage from a Gemini reply."""
+
+        self._record_usage(response)
+        return response.text
+
+    def _record_usage(self, response: BaseGenerateContentResponse) -> None:
         usage_metadata = response.usage_metadata
         if usage_metadata is None:
-            self._usage = TokenUsage()
-            return response.text
-        prompt_tokens = usage_metadata.prompt_token_count or 0
-        completion_tokens = usage_metadata.candidates_token_count or 0
+            return
+        input_tokens = usage_metadata.prompt_token_count or 0
+        cached_tokens = usage_metadata.cached_content_token_count or 0
         total_tokens = usage_metadata.total_token_count or 0
-        cached_tokens = max(total_tokens - (prompt_tokens + completion_tokens), 0)
-
-        self._usage = TokenUsage(
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            cached_tokens=cached_tokens,
-            cost_usd=0.0,
+        # Everything beyond the input (candidates and thoughts) is output.
+        completion_tokens = max(
+            total_tokens - input_tokens, usage_metadata.candidates_token_count or 0
         )
 
-        return response.text
+        with self._usage_lock:
+            self._usage = _accumulate_usage(
+                self._usage,
+                prompt_tokens=max(input_tokens - cached_tokens, 0),
+                completion_tokens=completion_tokens,
+                cached_tokens=cached_tokens,
+            )
 
     def get_token_usage(self) -> TokenUsage:
-        return self._usage
+        with self._usage_lock:
+            return self._usage
 
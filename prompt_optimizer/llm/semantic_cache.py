@@ -0,0 +1,404 @@
+"""Embedding-based response cache for near-duplicate prompts."""
+from __future__ import annotations
+
+import json
+import math
+import warnings
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from prompt_optimizer.domain.models import OptimizationStep, TokenUsage
+from prompt_optimizer.llm.client import LLMClient
+
+try:
+    import numpy as np  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # numpy ships with the optional ``semantic`` extra
+    np = None  # type: ignore[assignment, unused-ignore]
+
+Embedder = Callable[[str], Sequence[float]]
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Their prompts embed the whole session, so a near-duplicate differs exactly
+# where it matters (e.g. one refined section); only exact matches are safe.
+_EXACT_ONLY_STEPS = frozenset(
+    {OptimizationStep.HARMONIZATION, OptimizationStep.FINAL_OUTPUT}
+)
+_EXACT_ONLY_FIELDS = frozenset(step.value for step in _EXACT_ONLY_STEPS)
+# Templates put their shared static instructions before this separator.
+_DYNAMIC_SECTION_SEPARATOR = "\n---\n"
+# Marks the partitions of multi-field JSON answers in the partition keys.
+_JSON_PARTITION_PREFIX = "json:"
+
+
+def load_sentence_embedder(model_name: str = DEFAULT_EMBEDDING_MODEL) -> Embedder:
+    """Load a sentence-transformers model and return it as an embedder.
+
+    Raises:
+        ImportError: If the optional ``semantic`` extra is not installed.
+    """
+
+    try:
+        from sentence_transformers import (  # type: ignore[import-not-found]  # noqa: PLC0415
+            SentenceTransformer,
+        )
+    except ImportError as error:
+        raise ImportError(
+            "Semantic caching requires the 'semantic' extra: "
+            "pip install 'prompt-optimizer-cli[semantic]'"
+        ) from error
+
+    model = SentenceTransformer(model_name)
+
+    def embed(text: str) -> list[float]:
+        return [float(value) for value in model.encode(text)]
+
+    return embed
+
+
+def _step_key(step: OptimizationStep | None) -> str:
+    return step.value if step else ""
+
+
+def _json_key(fields: Sequence[str]) -> str | None:
+    """Return the partition key of a JSON call, or ``None`` if it is exact-only."""
+
+    if any(field in _EXACT_ONLY_FIELDS for field in fields):
+        return None
+    return _JSON_PARTITION_PREFIX + ",".join(fields)
+
+
+def _parse_entries(text: str) -> list[tuple[str, list[float], str]]:
+    """Parse a file written by ``SemanticLLMCache.save``.
+
+    Raises:
+        ValueError: If the text is not a cache file or its vectors do not all
+            have the same dimension.
+    """
+
+    payload = json.loads(text)
+    if not isinstance(payload, dict):
+        raise ValueError("expected an object of partitions")
+    entries: list[tuple[str, list[float], str]] = []
+    for key, items in payload.items():
+        if not isinstance(items, list):
+            raise ValueError(f"partition {key!r} is not a list")
+        for item in items:
+            if not isinstance(item, list):
+                raise ValueError(f"malformed entry in partition {key!r}")
+            vector, response = item  # ValueError unless a pair
+            if not (
+                isinstance(vector, list)
+                and isinstance(response, str)
+                and all(isinstance(value, int | float) for value in vector)
+            ):
+                raise ValueError(f"malformed entry in partition {key!r}")
+            entries.append((key, [float(value) for value in vector], response))
+    if len({len(vector) for _, vector, _ in entries}) > 1:
+        raise ValueError("vectors of different dimensions")
+    return entries
+
+
+class _Partition:
+    """Unit embeddings and responses cached for one step or JSON field set."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.vectors: list[list[float]] = []
+        self.responses: list[str] = []
+        self._max_entries = max_entries
+        self._matrix: Any = None
+
+    def add(self, vector: list[float], response: str) -> None:
+        """Append an entry, evicting the oldest ones beyond ``max_entries``."""
+
+        self.vectors.append(vector)
+        self.responses.append(response)
+        overflow = len(self.vectors) - self._max_entries
+        if overflow > 0:
+            del self.vectors[:overflow]
+            del self.responses[:overflow]
+        self._matrix = None
+
+    def best_match(self, query: list[float]) -> tuple[float, str] | None:
+        """Return the highest cosine similarity and its response, if any."""
+
+        if not self.vectors:
+            return None
+
+        if np is not None:
+            # One (N, d) @ (d,) product instead of N Python-level dot products.
+            if self._matrix is None:
+                self._matrix = np.asarray(self.vectors, dtype=np.float32)
+            scores = self._matrix @ np.asarray(query, dtype=np.float32)
+            index = int(scores.argmax())
+            return float(scores[index]), self.responses[index]
+
+        best_score, best_index = -1.0, 0
+        for index, candidate in enumerate(self.vectors):
+            score = sum(a * b for a, b in zip(candidate, query, strict=True))
+            if score > best_score:
+                best_score, best_index = score, index
+        return best_score, self.responses[best_index]
+
+
+class SemanticLLMCache(LLMClient):
+    """Serve cached responses for prompts whose embeddings are near-identical.
+
+    Entries are partitioned by optimization step, and JSON answers by their
+    exact field list, so a suggestion produced for one section is never
+    returned for another, however similar the prompts. Harmonization and
+    final-output calls are never matched approximately, and
+    only the dynamic part of a prompt (after the template's ``---`` separator)
+    is embedded, so shared instructions do not inflate the similarity.
+    Each partition keeps at most ``max_entries_per_step`` entries, dropping the
+    oldest first. When ``path`` is given, entries are loaded from it on
+    construction (subject to the same cap) and written back by ``save``.
+    """
+
+    def __init__(
+        self,
+        inner: LLMClient,
+        embedder: Embedder,
+        threshold: float = 0.92,
+        path: Path | None = None,
+        max_entries_per_step: int = 200,
+    ) -> None:
+        self.mode = inner.mode
+        self._inner = inner
+        self._embedder = embedder
+        self._threshold = threshold
+        self._path = path
+        self._max_entries_per_step = max_entries_per_step
+        # Keyed by step value ("" for no step) or by prefixed JSON field list.
+        self._partitions: dict[str, _Partition] = {}
+        # Length shared by every stored vector, once there is one.
+        self._dimension: int | None = None
+        self._hits = 0
+        self._misses = 0
+        if path is not None and path.exists():
+            self.load(path)
+
+    def generate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        if bypass_cache or step in _EXACT_ONLY_STEPS:
+            return self._inner.generate(prompt, step=step, bypass_cache=bypass_cache)
+
+        embedding = self._embed(prompt)
+        cached = self._lookup(embedding, _step_key(step))
+        if cached is not None:
+            return cached
+
+        response = self._inner.generate(prompt, step=step)
+        self._store(_step_key(step), embedding, response)
+        return response
+
+    async def agenerate(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> str:
+        if bypass_cache or step in _EXACT_ONLY_STEPS:
+            return await self._inner.agenerate(
+                prompt, step=step, bypass_cache=bypass_cache
+            )
+
+        embedding = self._embed(prompt)
+        cached = self._lookup(embedding, _step_key(step))
+        if cached is not None:
+            return cached
+
+        response = await self._inner.agenerate(prompt, step=step)
+        self._store(_step_key(step), embedding, response)
+        return response
+
+    def generate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> Iterator[str]:
+        if bypass_cache or step in _EXACT_ONLY_STEPS:
+            yield from self._inner.generate_stream(
+                prompt, step=step, bypass_cache=bypass_cache
+            )
+            return
+
+        embedding = self._embed(prompt)
+        cached = self._lookup(embedding, _step_key(step))
+        if cached is not None:
+            yield cached
+            return
+
+        chunks: list[str] = []
+        for chunk in self._inner.generate_stream(prompt, step=step):
+            chunks.append(chunk)
+            yield chunk
+        self._store(_step_key(step), embedding, "".join(chunks))
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        step: OptimizationStep | None = None,
+        *,
+        bypass_cache: bool = False,
+    ) -> AsyncIterator[str]:
+        if bypass_cache or step in _EXACT_ONLY_STEPS:
+            async for chunk in self._inner.agenerate_stream(
+                prompt, step=step, bypass_cache=bypass_cache
+            ):
+                yield chunk
+            return
+
+        embedding = self._embed(prompt)
+        cached = self._lookup(embedding, _step_key(step))
+        if cached is not None:
+            yield cached
+            return
+
+        chunks: list[str] = []
+        async for chunk in self._inner.agenerate_stream(prompt, step=step):
+            chunks.append(chunk)
+            yield chunk
+        self._store(_step_key(step), embedding, "".join(chunks))
+
+    def generate_batch(
+        self,
+        prompts: Sequence[str],
+        steps: Sequence[OptimizationStep | None],
+    ) -> list[str]:
+        # Batches are submitted whole rather than embedded prompt by prompt.
+        return self._inner.generate_batch(prompts, steps)
+
+    def generate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        key = _json_key(fields)
+        if bypass_cache or key is None:
+            return self._inner.generate_json(
+                prompt, fields, bypass_cache=bypass_cache
+            )
+
+        embedding = self._embed(prompt)
+        cached = self._lookup(embedding, key)
+        if cached is not None:
+            return cached
+
+        response = self._inner.generate_json(prompt, fields)
+        self._store(key, embedding, response)
+        return response
+
+    async def agenerate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        key = _json_key(fields)
+        if bypass_cache or key is None:
+            return await self._inner.agenerate_json(
+                prompt, fields, bypass_cache=bypass_cache
+            )
+
+        embedding = self._embed(prompt)
+        cached = self._lookup(embedding, key)
+        if cached is not None:
+            return cached
+
+        response = await self._inner.agenerate_json(prompt, fields)
+        self._store(key, embedding, response)
+        return response
+
+    def get_token_usage(self) -> TokenUsage:
+        usage = self._inner.get_token_usage()
+        return usage.model_copy(
+            update={
+                "cache_hits": usage.cache_hits + self._hits,
+                "cache_misses": usage.cache_misses + self._misses,
+            }
+        )
+
+    def save(self, path: Path | None = None) -> None:
+        """Write the cached entries to ``path`` (or the configured path) as JSON."""
+
+        target = path if path is not None else self._path
+        if target is None:
+            raise ValueError("No path configured for the semantic cache.")
+
+        payload = {
+            key: [
+                [vector, response]
+                for vector, response in zip(
+                    partition.vectors, partition.responses, strict=True
+                )
+            ]
+            for key, partition in self._partitions.items()
+        }
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps(payload), encoding="utf-8")
+
+    def load(self, path: Path) -> None:
+        """Add the entries previously written by ``save`` to this cache.
+
+        An unreadable or malformed file, or one whose vectors differ in
+        dimension from the entries already cached, is skipped with a warning.
+        """
+
+        try:
+            entries = _parse_entries(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as error:
+            warnings.warn(
+                f"Ignoring semantic cache file {path}: {error}.",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+            return
+
+        dimensions = {len(vector) for _, vector, _ in entries}
+        if self._dimension is not None and dimensions - {self._dimension}:
+            warnings.warn(
+                f"Ignoring semantic cache file {path}: its vectors do not have "
+                f"{self._dimension} dimensions.",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+            return
+        for key, vector, response in entries:
+            self._store(key, vector, response)
+
+    def _store(self, key: str, embedding: list[float], response: str) -> None:
+        self._dimension = len(embedding)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = self._partitions[key] = _Partition(self._max_entries_per_step)
+        partition.add(embedding, response)
+
+    def _embed(self, prompt: str) -> list[float]:
+        """Embed the prompt's dynamic part, scaled to unit length for cosine."""
+
+        dynamic = prompt.partition(_DYNAMIC_SECTION_SEPARATOR)[2] or prompt
+        vector = [float(value) for value in self._embedder(dynamic)]
+        if self._dimension is not None and len(vector) != self._dimension:
+            # Loaded entries come from another embedding model and can never
+            # match; drop them rather than fail every lookup.
+            self._partitions.clear()
+            self._dimension = None
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm == 0.0:
+            return vector
+        return [value / norm for value in vector]
+
+    def _lookup(self, embedding: list[float], key: str) -> str | None:
+        partition = self._partitions.get(key)
+        match = partition.best_match(embedding) if partition else None
+        if match is not None and match[0] >= self._threshold:
+            self._hits += 1
+            return match[1]
+
+        self._misses += 1
+        return None
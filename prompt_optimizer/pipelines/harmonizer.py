@@ -1,6 +1,9 @@
 """Global harmonization stage for prompt optimization."""
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Callable, Sequence
+
 from prompt_optimizer.domain.models import AnalysisResult, OptimizationStep, PromptSession
 from prompt_optimizer.llm.client import LLMClient
 from prompt_optimizer.prompts.manager import PromptManager
@@ -21,6 +24,53 @@ class GlobalHarmonizer:
             harmonize_prompt, step=OptimizationStep.HARMONIZATION
         )
 
+        return self._apply(session, response)
+
+    async def aharmonize(self, session: PromptSession) -> PromptSession:
+        """Asynchronously run the harmonization prompt and update the session."""
+
+        harmonize_prompt = self._prompt_manager.render_global_harmonize(session)
+        response = await self._client.agenerate(
+            harmonize_prompt, step=OptimizationStep.HARMONIZATION
+        )
+
+        return self._apply(session, response)
+
+    async def aharmonize_ensemble(
+        self,
+        session: PromptSession,
+        n: int = 4,
+        selector: Callable[[Sequence[str]], str] | None = None,
+    ) -> PromptSession:
+        """Sample ``n`` harmonizations concurrently and keep the selected one.
+
+        The candidates bypass the response caches so they are independent
+        samples. ``selector`` picks the winner (the first candidate by default);
+        only the winner is recorded on the session.
+        """
+
+        if n < 1:
+            raise ValueError("The ensemble needs at least one candidate.")
+
+        harmonize_prompt = self._prompt_manager.render_global_harmonize(session)
+        candidates = await asyncio.gather(
+            *(
+                self._client.agenerate(
+                    harmonize_prompt,
+                    step=OptimizationStep.HARMONIZATION,
+                    bypass_cache=True,
+                )
+                for _ in range(n)
+            )
+        )
+        response = selector(candidates) if selector else candidates[0]
+
+        return self._apply(session, response)
+
+    @staticmethod
+    def _apply(session: PromptSession, response: str) -> PromptSession:
+        """Record the harmonized prompt as the session's final output."""
+
         harmonization_result = AnalysisResult(
             step=OptimizationStep.HARMONIZATION,
             summary="Harmonized the prompt based on the full session state.",
@@ -33,7 +83,7 @@ class GlobalHarmonizer:
             summary="Final optimized prompt ready for use.",
             details={"final_prompt": response},
         )
-        session.parameters[OptimizationStep.FINAL_OUTPUT.value] = response
+        session.set_parameter(OptimizationStep.FINAL_OUTPUT.value, response)
         session.record_analysis(final_output_result)
 
         return session
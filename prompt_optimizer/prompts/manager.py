@@ -2,30 +2,145 @@
 from __future__ import annotations
 
 import json
+import weakref
+from collections import OrderedDict
+from collections.abc import Sequence
+from string import Formatter
 from textwrap import dedent
 
 from prompt_optimizer.domain.models import OptimizationStep, PromptSession
 
+try:
+    import orjson
+except ImportError:  # orjson ships with the optional ``speedups`` extra
+    orjson = None  # type: ignore[assignment, unused-ignore]
+
+# Sent verbatim as the system message of every call. Providers cache prompts
+# by longest shared prefix, so nothing session-specific may ever go in here.
+STATIC_SYSTEM_PREFIX = dedent(
+    """
+    You are assisting with the prompt optimization process.
+    A draft prompt is refined one dimension at a time (user intent, role,
+    objective, context, audience, key points, constraints, output) and the
+    accepted dimensions are finally harmonized into a single prompt.
+    Preserve the user's intent, do not invent requirements the draft does
+    not imply, and follow the response format requested in each message.
+    """
+).strip()
+
+
+def _dumps(value: object) -> str:
+    """Serialize ``value`` to compact JSON, natively when orjson is installed."""
+
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    # Same output as orjson: no whitespace and raw UTF-8.
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def _first_sentence(text: str) -> str:
+    line = text.split("\n", 1)[0]
+    end = line.find(". ")
+    return line if end == -1 else line[: end + 1]
+
+
+def _forget_session(manager_ref: weakref.ref[PromptManager], session_id: int) -> None:
+    manager = manager_ref()
+    if manager is None:
+        return
+    manager._tracked_sessions.discard(session_id)
+    for cache in (manager._parameters_cache, manager._harmonize_cache):
+        for key in [key for key in cache if key[0] == session_id]:
+            del cache[key]
+
+
+class _SplitTemplate:
+    """A ``str.format`` template pre-split into literal fragments and fields.
+
+    Rendering joins the fragments with the substituted values, so the template
+    is parsed once instead of on every ``format`` call.
+    """
+
+    __slots__ = ("_fields", "_literals")
+
+    def __init__(self, template: str) -> None:
+        literals: list[str] = []
+        fields: list[str] = []
+        pending = ""
+        for literal, field, spec, conversion in Formatter().parse(template):
+            pending += literal
+            if field is None:
+                continue
+            if spec or conversion or not field.isidentifier():
+                raise ValueError(f"Unsupported template field: {{{field}}}")
+            literals.append(pending)
+            fields.append(field)
+            pending = ""
+        literals.append(pending)
+        self._literals = tuple(literals)
+        self._fields = tuple(fields)
+
+    def render(self, **values: str) -> str:
+        parts = [self._literals[0]]
+        for field, literal in zip(self._fields, self._literals[1:], strict=True):
+            parts.append(values[field])
+            parts.append(literal)
+        return "".join(parts)
+
 
 class PromptManager:
     """Render templated prompts used throughout the optimization pipeline."""
 
+    # Static instructions lead so consecutive calls share a cacheable prefix;
+    # dynamic values are only substituted after the ``---`` separator.
     analyze_step_template = dedent(
         """
-        You are assisting with the prompt optimization process.
-        Evaluate and expand the "{step_label}" dimension of the prompt.
+        Evaluate and expand a single dimension of the draft prompt below.
+        Respond with a concise recommendation for that dimension and include
+        a short justification. Keep the answer plain text.
+
+        ---
+        Dimension: {step_label}
 
         Draft prompt:
         {user_prompt}
 
         Previously collected parameters:
         {parameters}
+        """
+    ).strip()
 
-        Additional guidance from the operator (optional):
+    # Refinement variant; the guidance section is omitted entirely when the
+    # operator gave none.
+    analyze_step_feedback_template = analyze_step_template + dedent(
+        """
+
+        Additional guidance from the operator:
         {feedback}
+        """
+    ).rstrip()
 
-        Respond with a concise recommendation for the {step_label} and
-        include a short justification. Keep the answer plain text.
+    analyze_all_steps_template = dedent(
+        """
+        Evaluate and expand every dimension of the draft prompt listed below.
+        For each dimension give a concise recommendation and a short
+        justification in plain text. Respond with a single JSON object whose
+        keys are exactly the dimension keys listed, each mapped to its
+        recommendation as a string.
+
+        ---
+        Dimensions (key: label):
+        {dimensions}
+
+        Draft prompt:
+        {user_prompt}
+
+        Previously collected parameters:
+        {parameters}
         """
     ).strip()
 
@@ -35,15 +150,35 @@ class PromptManager:
         Given the session state below, harmonize the components into a single,
         coherent prompt ready for execution. Resolve any inconsistencies and
         preserve the user's intent.
+        Return the harmonized prompt as polished Markdown. Include a brief note
+        explaining the key changes you applied to ensure consistency.
 
+        ---
         Session state (JSON):
         {session_state}
-
-        Return the harmonized prompt as polished Markdown. Include a brief note
-        explaining the key changes you applied to ensure consistency.
         """
     ).strip()
 
+    # Budgets for the collected parameters embedded in analysis prompts.
+    max_chars_per_parameter = 800
+    max_parameters_chars = 4000
+    summary_chars = 200
+    # Entries kept in each per-session render cache.
+    render_cache_size = 32
+
+    def __init__(self) -> None:
+        self._analyze_step = _SplitTemplate(self.analyze_step_template)
+        self._analyze_step_feedback = _SplitTemplate(
+            self.analyze_step_feedback_template
+        )
+        self._analyze_all_steps = _SplitTemplate(self.analyze_all_steps_template)
+        self._global_harmonize = _SplitTemplate(self.global_harmonize_template)
+        # Encoded parameters and rendered harmonize prompts, both keyed by
+        # (id(session), session.version).
+        self._parameters_cache: OrderedDict[tuple[int, int], str] = OrderedDict()
+        self._harmonize_cache: OrderedDict[tuple[int, int], str] = OrderedDict()
+        self._tracked_sessions: set[int] = set()
+
     def render_analyze_step(
         self,
         step: OptimizationStep,
@@ -53,17 +188,100 @@ class PromptManager:
     ) -> str:
         """Render the analysis prompt for a specific optimization step."""
 
-        feedback_value = feedback if feedback is not None else "None provided"
-        return self.analyze_step_template.format(
-            step_label=step.value.replace("_", " ").title(),
+        parameters = self._session_parameters(session)
+        if feedback is None or not feedback.strip():
+            return self._analyze_step.render(
+                step_label=step.label, user_prompt=user_prompt, parameters=parameters
+            )
+        return self._analyze_step_feedback.render(
+            step_label=step.label,
             user_prompt=user_prompt,
-            parameters=json.dumps(session.parameters),
-            feedback=feedback_value,
+            parameters=parameters,
+            feedback=feedback,
         )
 
-    def render_global_harmonize(self, session: PromptSession) -> str:
-        """Render the harmonization prompt for the full session state."""
+    def render_analyze_all_steps(
+        self,
+        steps: Sequence[OptimizationStep],
+        user_prompt: str,
+        session: PromptSession,
+    ) -> str:
+        """Render one prompt requesting suggestions for several steps at once."""
 
-        return self.global_harmonize_template.format(
-            session_state=json.dumps(session.model_dump(mode="json"))
+        dimensions = "\n".join(
+            f"- {step.value}: {step.label}"
+            for step in steps
+        )
+        return self._analyze_all_steps.render(
+            dimensions=dimensions,
+            user_prompt=user_prompt,
+            parameters=self._session_parameters(session),
         )
+
+    def _session_parameters(self, session: PromptSession) -> str:
+        """Return the compacted parameters as JSON, memoized per session version."""
+
+        key = (id(session), session.version)
+        cached = self._parameters_cache.get(key)
+        if cached is not None:
+            self._parameters_cache.move_to_end(key)
+            return cached
+
+        encoded = _dumps(self._compact_parameters(session.parameters))
+        self._remember(self._parameters_cache, session, key, encoded)
+        return encoded
+
+    def _compact_parameters(self, parameters: dict[str, str]) -> dict[str, str]:
+        """Shrink the collected parameters to fit the analysis prompt budget.
+
+        Empty values are dropped and each value is stripped and truncated to
+        ``max_chars_per_parameter``. While the total still exceeds
+        ``max_parameters_chars``, the oldest entries are cut to their first
+        sentence; the most recent entry is always kept intact.
+        """
+
+        compact = {
+            key: _truncate(value.strip(), self.max_chars_per_parameter)
+            for key, value in parameters.items()
+            if value and value.strip()
+        }
+        total = sum(len(key) + len(value) for key, value in compact.items())
+        for key in list(compact)[:-1]:
+            if total <= self.max_parameters_chars:
+                break
+            summary = _truncate(_first_sentence(compact[key]), self.summary_chars)
+            total -= len(compact[key]) - len(summary)
+            compact[key] = summary
+        return compact
+
+    def render_global_harmonize(self, session: PromptSession) -> str:
+        """Render the harmonization prompt for the full session state.
+
+        Renders are memoized per session version, so retries and ensembles
+        over an unchanged session reuse the same prompt string.
+        """
+
+        key = (id(session), session.version)
+        cached = self._harmonize_cache.get(key)
+        if cached is not None:
+            self._harmonize_cache.move_to_end(key)
+            return cached
+
+        prompt = self._global_harmonize.render(session_state=session.model_dump_json())
+        self._remember(self._harmonize_cache, session, key, prompt)
+        return prompt
+
+    def _remember(
+        self,
+        cache: OrderedDict[tuple[int, int], str],
+        session: PromptSession,
+        key: tuple[int, int],
+        value: str,
+    ) -> None:
+        cache[key] = value
+        if len(cache) > self.render_cache_size:
+            cache.popitem(last=False)
+        if key[0] not in self._tracked_sessions:
+            # ids are reused after collection, so forget a session once it dies.
+            self._tracked_sessions.add(key[0])
+            weakref.finalize(session, _forget_session, weakref.ref(self), key[0])
@@ -1,6 +1,10 @@
 """State machine orchestration for the prompt optimizer."""
 from __future__ import annotations
 
+import asyncio
+import json
+from collections.abc import Callable, Sequence
+
 from prompt_optimizer.domain.models import AnalysisResult, OptimizationStep, PromptSession
 from prompt_optimizer.llm.client import LLMClient
 from prompt_optimizer.prompts.manager import PromptManager
@@ -19,16 +23,216 @@ class PromptOptimizerEngine:
         step: OptimizationStep,
         user_prompt: str,
         feedback: str | None = None,
+        on_chunk: Callable[[str], None] | None = None,
     ) -> AnalysisResult:
-        """Generate a suggestion for a single optimization step."""
+        """Generate a suggestion for a single optimization step.
+
+        Passing ``feedback`` marks the call as a refinement, which always
+        requests a fresh generation instead of a cached one. When ``on_chunk``
+        is given the response is streamed and each fragment is passed to it
+        as soon as it arrives.
+        """
 
         prompt = self._prompt_manager.render_analyze_step(
             step=step, user_prompt=user_prompt, session=session, feedback=feedback
         )
-        response = self._client.generate(prompt, step=step)
+        bypass_cache = feedback is not None
+        if on_chunk is None:
+            response = self._client.generate(
+                prompt, step=step, bypass_cache=bypass_cache
+            )
+        else:
+            chunks: list[str] = []
+            for chunk in self._client.generate_stream(
+                prompt, step=step, bypass_cache=bypass_cache
+            ):
+                chunks.append(chunk)
+                on_chunk(chunk)
+            response = "".join(chunks)
 
         return AnalysisResult(
             step=step,
             summary=response,
             details={"suggestion": response, "prompt": prompt},
         )
+
+    async def aprocess_step(
+        self,
+        session: PromptSession,
+        step: OptimizationStep,
+        user_prompt: str,
+        feedback: str | None = None,
+        on_chunk: Callable[[str], None] | None = None,
+    ) -> AnalysisResult:
+        """Asynchronously generate a suggestion for a single optimization step.
+
+        The prompt is rendered before the first await, so steps gathered
+        together all see the same snapshot of the session. When ``on_chunk``
+        is given the response is streamed and each fragment is passed to it
+        as soon as it arrives.
+        """
+
+        prompt = self._prompt_manager.render_analyze_step(
+            step=step, user_prompt=user_prompt, session=session, feedback=feedback
+        )
+        bypass_cache = feedback is not None
+        if on_chunk is None:
+            response = await self._client.agenerate(
+                prompt, step=step, bypass_cache=bypass_cache
+            )
+        else:
+            chunks: list[str] = []
+            async for chunk in self._client.agenerate_stream(
+                prompt, step=step, bypass_cache=bypass_cache
+            ):
+                chunks.append(chunk)
+                on_chunk(chunk)
+            response = "".join(chunks)
+
+        return AnalysisResult(
+            step=step,
+            summary=response,
+            details={"suggestion": response, "prompt": prompt},
+        )
+
+    async def aprocess_steps(
+        self,
+        session: PromptSession,
+        steps: Sequence[OptimizationStep],
+        user_prompt: str,
+    ) -> list[AnalysisResult]:
+        """Generate independent suggestions for several steps concurrently.
+
+        Every prompt is rendered from the same session snapshot and the results
+        are returned in the order of ``steps``.
+        """
+
+        return list(
+            await asyncio.gather(
+                *(
+                    self.aprocess_step(
+                        session=session, step=step, user_prompt=user_prompt
+                    )
+                    for step in steps
+                )
+            )
+        )
+
+    def process_steps_offline(
+        self,
+        session: PromptSession,
+        user_prompt: str,
+        steps: Sequence[OptimizationStep],
+    ) -> list[AnalysisResult]:
+        """Generate suggestions for several steps through the batch endpoint.
+
+        Intended for bulk runs where latency does not matter: every prompt is
+        rendered from the same session snapshot and submitted together, which
+        backends with an offline batch API serve at a lower cost.
+        """
+
+        prompts = [
+            self._prompt_manager.render_analyze_step(
+                step=step, user_prompt=user_prompt, session=session
+            )
+            for step in steps
+        ]
+        responses = self._client.generate_batch(prompts, steps)
+
+        return [
+            AnalysisResult(
+                step=step,
+                summary=response,
+                details={"suggestion": response, "prompt": prompt},
+            )
+            for step, prompt, response in zip(steps, prompts, responses, strict=True)
+        ]
+
+    def process_all_steps(
+        self,
+        session: PromptSession,
+        user_prompt: str,
+        steps: Sequence[OptimizationStep],
+    ) -> list[AnalysisResult]:
+        """Generate suggestions for several steps with a single LLM call.
+
+        Steps missing from the batched answer, or all of them when it is not
+        valid JSON, are generated individually instead.
+        """
+
+        prompt = self._prompt_manager.render_analyze_all_steps(
+            steps=steps, user_prompt=user_prompt, session=session
+        )
+        response = self._client.generate_json(
+            prompt, fields=[step.value for step in steps]
+        )
+        suggestions = self._parse_suggestions(response, steps)
+
+        return [
+            self._batched_result(step, suggestions[step], prompt)
+            if step in suggestions
+            else self.process_step(session=session, step=step, user_prompt=user_prompt)
+            for step in steps
+        ]
+
+    async def aprocess_all_steps(
+        self,
+        session: PromptSession,
+        user_prompt: str,
+        steps: Sequence[OptimizationStep],
+    ) -> list[AnalysisResult]:
+        """Asynchronously generate suggestions for several steps in one call.
+
+        Steps missing from the batched answer are generated concurrently.
+        """
+
+        prompt = self._prompt_manager.render_analyze_all_steps(
+            steps=steps, user_prompt=user_prompt, session=session
+        )
+        response = await self._client.agenerate_json(
+            prompt, fields=[step.value for step in steps]
+        )
+        suggestions = self._parse_suggestions(response, steps)
+
+        missing = [step for step in steps if step not in suggestions]
+        fallbacks = await self.aprocess_steps(
+            session=session, steps=missing, user_prompt=user_prompt
+        )
+        recovered = dict(zip(missing, fallbacks, strict=True))
+
+        return [
+            self._batched_result(step, suggestions[step], prompt)
+            if step in suggestions
+            else recovered[step]
+            for step in steps
+        ]
+
+    @staticmethod
+    def _parse_suggestions(
+        response: str, steps: Sequence[OptimizationStep]
+    ) -> dict[OptimizationStep, str]:
+        """Extract the non-empty string suggestion of each step, if present."""
+
+        try:
+            payload = json.loads(response)
+        except json.JSONDecodeError:
+            return {}
+        if not isinstance(payload, dict):
+            return {}
+
+        suggestions: dict[OptimizationStep, str] = {}
+        for step in steps:
+            value = payload.get(step.value)
+            if isinstance(value, str) and value.strip():
+                suggestions[step] = value.strip()
+        return suggestions
+
+    @staticmethod
+    def _batched_result(
+        step: OptimizationStep, suggestion: str, prompt: str
+    ) -> AnalysisResult:
+        return AnalysisResult(
+            step=step,
+            summary=suggestion,
+            details={"suggestion": suggestion, "prompt": prompt},
+        )
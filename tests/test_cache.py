@@ -0,0 +1,229 @@
+import asyncio
+
+import pytest
+
+from prompt_optimizer.domain.models import OptimizationStep
+from prompt_optimizer.llm.cache import CachingLLMClient, InMemoryCacheBackend
+from prompt_optimizer.llm.client import MockLLMClient
+from prompt_optimizer.llm.semantic_cache import SemanticLLMCache
+
+
+def test_repeated_prompt_is_served_from_cache():
+    inner = MockLLMClient()
+    client = CachingLLMClient(inner)
+
+    first = client.generate("draft", step=OptimizationStep.ROLE)
+    second = client.generate("draft", step=OptimizationStep.ROLE)
+
+    assert first == second
+    assert inner.get_token_usage().prompt_tokens == 1
+    usage = client.get_token_usage()
+    assert (usage.cache_hits, usage.cache_misses) == (1, 1)
+
+
+def test_cache_key_includes_step():
+    client = CachingLLMClient(MockLLMClient())
+
+    role = client.generate("draft", step=OptimizationStep.ROLE)
+    context = client.generate("draft", step=OptimizationStep.CONTEXT)
+
+    assert role != context
+    assert client.get_token_usage().cache_hits == 0
+
+
+def test_bypass_cache_always_calls_backend():
+    inner = MockLLMClient()
+    client = CachingLLMClient(inner)
+
+    client.generate("draft")
+    tokens_after_first_call = inner.get_token_usage().prompt_tokens
+    asyncio.run(client.agenerate("draft", bypass_cache=True))
+
+    assert inner.get_token_usage().prompt_tokens > tokens_after_first_call
+    assert client.get_token_usage().cache_hits == 0
+
+
+def test_in_memory_backend_evicts_least_recently_used():
+    backend = InMemoryCacheBackend(max_entries=2)
+    backend.set(b"a", "1")
+    backend.set(b"b", "2")
+    backend.get(b"a")
+    backend.set(b"c", "3")
+
+    assert backend.get(b"a") == "1"
+    assert backend.get(b"b") is None
+
+
+def test_in_memory_backend_evicts_oldest_fifth_when_full():
+    backend = InMemoryCacheBackend(max_entries=10)
+    for index in range(11):
+        backend.set(bytes([index]), str(index))
+
+    assert backend.get(bytes([0])) is None
+    assert backend.get(bytes([1])) is None
+    assert backend.get(bytes([2])) == "2"
+
+
+def test_in_memory_backend_expires_entries():
+    backend = InMemoryCacheBackend()
+    backend.set(b"a", "1", ttl=0)
+
+    assert backend.get(b"a") is None
+
+
+def test_semantic_cache_serves_near_duplicates_per_step():
+    vectors = {"draft a": [1.0, 0.0], "draft b": [0.99, 0.05], "other": [0.0, 1.0]}
+    inner = MockLLMClient()
+    client = SemanticLLMCache(inner, embedder=vectors.__getitem__, threshold=0.95)
+
+    first = client.generate("draft a", step=OptimizationStep.ROLE)
+    near = client.generate("draft b", step=OptimizationStep.ROLE)
+    client.generate("draft b", step=OptimizationStep.CONTEXT)
+    client.generate("other", step=OptimizationStep.ROLE)
+
+    assert near == first
+    usage = client.get_token_usage()
+    assert (usage.cache_hits, usage.cache_misses) == (1, 3)
+
+
+def test_semantic_cache_round_trips_through_disk(tmp_path):
+    vectors = {"draft a": [1.0, 0.0], "draft b": [0.99, 0.05]}
+    path = tmp_path / "semantic.json"
+    original = SemanticLLMCache(
+        MockLLMClient(), embedder=vectors.__getitem__, path=path
+    )
+    first = original.generate("draft a", step=OptimizationStep.ROLE)
+    original.save()
+
+    inner = MockLLMClient()
+    restored = SemanticLLMCache(inner, embedder=vectors.__getitem__, path=path)
+
+    assert restored.generate("draft b", step=OptimizationStep.ROLE) == first
+    assert inner.get_token_usage().total_tokens == 0
+
+
+def test_semantic_cache_matches_batched_json_rounds_per_field_list():
+    vectors = {"draft a": [1.0, 0.0], "draft b": [0.99, 0.05]}
+    inner = MockLLMClient()
+    client = CachingLLMClient(
+        SemanticLLMCache(inner, embedder=vectors.__getitem__, threshold=0.95)
+    )
+    fields = [OptimizationStep.ROLE.value, OptimizationStep.CONTEXT.value]
+
+    async def rounds() -> list[str]:
+        return [
+            await client.agenerate_json("Rules.\n---\ndraft a", fields),
+            await client.agenerate_json("Rules.\n---\ndraft b", fields),
+            await client.agenerate_json("Rules.\n---\ndraft b", fields[:1]),
+        ]
+
+    first, near, narrower = asyncio.run(rounds())
+
+    assert near == first
+    assert narrower != first
+    # Three exact-cache misses, then a semantic miss, hit and miss.
+    usage = client.get_token_usage()
+    assert (usage.cache_hits, usage.cache_misses) == (1, 5)
+
+
+def test_semantic_cache_never_matches_harmonization():
+    inner = MockLLMClient()
+    client = SemanticLLMCache(inner, embedder=lambda _: [1.0, 0.0])
+
+    client.generate("state a", step=OptimizationStep.HARMONIZATION)
+    client.generate("state b", step=OptimizationStep.HARMONIZATION)
+
+    usage = client.get_token_usage()
+    assert (usage.cache_hits, usage.cache_misses) == (0, 0)
+    assert inner.get_token_usage().prompt_tokens > 0
+
+
+def test_semantic_cache_embeds_only_the_dynamic_section():
+    embedded: list[str] = []
+
+    def embed(text: str) -> list[float]:
+        embedded.append(text)
+        return [1.0, 0.0]
+
+    client = SemanticLLMCache(MockLLMClient(), embedder=embed)
+    client.generate("Shared instructions.\n---\nDimension: Role", step=None)
+
+    assert embedded == ["Dimension: Role"]
+
+
+def test_semantic_cache_caps_entries_per_step_on_load(tmp_path):
+    vectors = {"a": [1.0, 0.0], "b": [0.0, 1.0], "c": [-1.0, 0.0]}
+    path = tmp_path / "semantic.json"
+    original = SemanticLLMCache(MockLLMClient(), embedder=vectors.__getitem__)
+    for prompt in vectors:
+        original.generate(prompt, step=OptimizationStep.ROLE)
+    original.save(path)
+
+    restored = SemanticLLMCache(
+        MockLLMClient(),
+        embedder=vectors.__getitem__,
+        path=path,
+        max_entries_per_step=2,
+    )
+    restored.generate("a", step=OptimizationStep.ROLE)
+    restored.generate("c", step=OptimizationStep.ROLE)
+
+    usage = restored.get_token_usage()
+    assert (usage.cache_hits, usage.cache_misses) == (1, 1)
+
+
+def test_drained_stream_is_cached():
+    client = CachingLLMClient(MockLLMClient())
+
+    async def collect() -> str:
+        chunks = [chunk async for chunk in client.agenerate_stream("draft")]
+        return "".join(chunks)
+
+    streamed = asyncio.run(collect())
+
+    assert client.generate("draft") == streamed
+    assert client.get_token_usage().cache_hits == 1
+
+
+def test_batch_only_sends_cache_misses():
+    inner = MockLLMClient()
+    client = CachingLLMClient(inner)
+    cached = client.generate("draft", step=OptimizationStep.ROLE)
+    tokens_before_batch = inner.get_token_usage().prompt_tokens
+
+    responses = client.generate_batch(
+        ["draft", "draft"], [OptimizationStep.ROLE, OptimizationStep.CONTEXT]
+    )
+
+    assert responses[0] == cached
+    assert responses[1] == inner.generate("draft", step=OptimizationStep.CONTEXT)
+    assert client.get_token_usage().cache_hits == 1
+    assert inner.get_token_usage().prompt_tokens > tokens_before_batch
+
+
+@pytest.mark.parametrize("content", ["not json", '{"role": [[[1.0], 2]]}'])
+def test_semantic_cache_skips_unreadable_files(tmp_path, content):
+    path = tmp_path / "semantic.json"
+    path.write_text(content, encoding="utf-8")
+
+    with pytest.warns(RuntimeWarning, match="Ignoring semantic cache"):
+        client = SemanticLLMCache(MockLLMClient(), embedder=lambda _: [1.0], path=path)
+
+    client.generate("draft", step=OptimizationStep.ROLE)
+    assert client.get_token_usage().cache_misses == 1
+
+
+def test_semantic_cache_drops_entries_of_another_dimension(tmp_path):
+    path = tmp_path / "semantic.json"
+    original = SemanticLLMCache(MockLLMClient(), embedder=lambda _: [1.0, 0.0, 0.0])
+    original.generate("draft", step=OptimizationStep.ROLE)
+    original.save(path)
+
+    restored = SemanticLLMCache(
+        MockLLMClient(), embedder=lambda _: [1.0, 0.0], path=path
+    )
+    restored.generate("draft", step=OptimizationStep.ROLE)
+    restored.generate("draft", step=OptimizationStep.ROLE)
+
+    usage = restored.get_token_usage()
+    assert (usage.cache_hits, usage.cache_misses) == (1, 1)
@@ -0,0 +1,345 @@
+import asyncio
+import json
+import math
+from types import SimpleNamespace
+
+import pytest
+from google.generativeai import protos
+from google.generativeai.types.generation_types import GenerateContentResponse
+from openai import APIError
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion
+
+from prompt_optimizer.domain.models import OptimizationStep, TokenUsage
+from prompt_optimizer.llm.client import (
+    GeminiLLMClient,
+    OpenAILLMClient,
+    PromptTooLargeError,
+    _mean_logprob,
+    _shared_route,
+)
+from prompt_optimizer.prompts.manager import STATIC_SYSTEM_PREFIX
+
+
+def test_oversized_prompt_is_rejected_before_the_request():
+    client = OpenAILLMClient("gpt-5", api_key="test-key")
+
+    with pytest.raises(PromptTooLargeError):
+        client.generate("word " * 400_000)
+
+
+def _completion(
+    logprobs: list[float] | None,
+    content: str = "answer",
+    usage: CompletionUsage | None = None,
+) -> ChatCompletion:
+    answer = content
+    tokens = (
+        [{"token": "t", "logprob": value, "top_logprobs": []} for value in logprobs]
+        if logprobs is not None
+        else None
+    )
+    return ChatCompletion.model_validate(
+        {
+            "id": "draft",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "draft-model",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": answer},
+                    "logprobs": {"content": tokens} if tokens is not None else None,
+                }
+            ],
+            "usage": usage.model_dump() if usage is not None else None,
+        }
+    )
+
+
+def test_draft_confidence_is_mean_token_logprob():
+    assert _mean_logprob(_completion([-0.1, -0.3])) == pytest.approx(-0.2)
+
+
+class RecordingCompletions:
+    """Chat completions stub that keeps the keyword arguments of each call."""
+
+    def __init__(self) -> None:
+        self.calls: list[dict[str, object]] = []
+
+    def create(self, **kwargs: object) -> ChatCompletion:
+        self.calls.append(kwargs)
+        return _completion(None)
+
+
+def test_system_prefix_leads_and_cache_key_is_shared_across_steps():
+    client = OpenAILLMClient(
+        "gpt-5", api_key="test-key", system_prompt=STATIC_SYSTEM_PREFIX
+    )
+    completions = RecordingCompletions()
+    client._client = SimpleNamespace(  # type: ignore[assignment]
+        chat=SimpleNamespace(completions=completions)
+    )
+
+    client.generate("role prompt", step=OptimizationStep.ROLE)
+    client.generate("context prompt", step=OptimizationStep.CONTEXT)
+
+    first, second = completions.calls
+    for call, prompt in ((first, "role prompt"), (second, "context prompt")):
+        assert call["messages"] == [
+            {"role": "system", "content": STATIC_SYSTEM_PREFIX},
+            {"role": "user", "content": prompt},
+        ]
+    assert first["extra_body"] == second["extra_body"]
+    assert first["extra_body"]["prompt_cache_key"]
+
+
+DRAFT_USAGE = CompletionUsage(prompt_tokens=10, completion_tokens=2, total_tokens=12)
+VERIFY_USAGE = CompletionUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+
+
+class StubDraftCompletions:
+    """Async chat completions answering draft (logprobs) and verify calls."""
+
+    def __init__(
+        self, draft: ChatCompletion | APIError, verify_gate: asyncio.Event | None
+    ) -> None:
+        self.draft = draft
+        self.verify_gate = verify_gate
+        self.verify_cancelled = False
+
+    async def create(self, *, logprobs: bool = False, **_: object) -> ChatCompletion:
+        if logprobs:
+            if isinstance(self.draft, APIError):
+                raise self.draft
+            # Yield once so an ungated verification call can finish first.
+            await asyncio.sleep(0)
+            return self.draft
+        try:
+            if self.verify_gate is not None:
+                await self.verify_gate.wait()
+        except asyncio.CancelledError:
+            self.verify_cancelled = True
+            raise
+        return _completion(None, content="verified", usage=VERIFY_USAGE)
+
+
+def _race(
+    draft: ChatCompletion | APIError, *, verify_blocks: bool
+) -> tuple[str, OpenAILLMClient, StubDraftCompletions]:
+    client = OpenAILLMClient("gpt-5", api_key="test-key", draft_model="gpt-5-nano")
+
+    async def run() -> tuple[str, StubDraftCompletions]:
+        completions = StubDraftCompletions(
+            draft, asyncio.Event() if verify_blocks else None
+        )
+        client._aclient = SimpleNamespace(  # type: ignore[assignment]
+            chat=SimpleNamespace(completions=completions)
+        )
+        answer = await client.agenerate("prompt", step=OptimizationStep.ROLE)
+        # Let the cancellation reach the pending verification call.
+        await asyncio.sleep(0)
+        return answer, completions
+
+    answer, completions = asyncio.run(run())
+    return answer, client, completions
+
+
+def _completion_tokens(*usages: CompletionUsage) -> int:
+    return sum(usage.completion_tokens for usage in usages)
+
+
+def test_confident_draft_cancels_verification():
+    draft = _completion([-0.01], content="drafted", usage=DRAFT_USAGE)
+
+    answer, client, completions = _race(draft, verify_blocks=True)
+
+    assert answer == "drafted"
+    assert completions.verify_cancelled
+    assert client.get_token_usage().completion_tokens == _completion_tokens(
+        DRAFT_USAGE
+    )
+
+
+def test_confident_draft_still_bills_finished_verification():
+    draft = _completion([-0.01], content="drafted", usage=DRAFT_USAGE)
+
+    answer, client, _ = _race(draft, verify_blocks=False)
+
+    assert answer == "drafted"
+    assert client.get_token_usage().completion_tokens == _completion_tokens(
+        DRAFT_USAGE, VERIFY_USAGE
+    )
+
+
+def test_unconfident_draft_waits_for_verification():
+    draft = _completion([-2.0], content="drafted", usage=DRAFT_USAGE)
+
+    answer, client, _ = _race(draft, verify_blocks=False)
+
+    assert answer == "verified"
+    assert client.get_token_usage().completion_tokens == _completion_tokens(
+        DRAFT_USAGE, VERIFY_USAGE
+    )
+
+
+def test_failed_draft_falls_back_to_verification():
+    error = APIError("draft unavailable", request=None, body=None)  # type: ignore[arg-type]
+
+    answer, client, _ = _race(error, verify_blocks=False)
+
+    assert answer == "verified"
+    assert client.get_token_usage().completion_tokens == _completion_tokens(
+        VERIFY_USAGE
+    )
+    assert _mean_logprob(_completion(None)) == -math.inf
+
+
+def test_openai_usage_splits_cached_prompt_tokens():
+    client = OpenAILLMClient("gpt-5", api_key="test-key")
+
+    billed = [
+        CompletionUsage(
+            prompt_tokens=100,
+            completion_tokens=20,
+            total_tokens=120,
+            prompt_tokens_details={"cached_tokens": 60},
+        ),
+        CompletionUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+    ]
+    for reported in billed:
+        client._record_usage(reported)
+
+    usage = client.get_token_usage()
+    assert usage == TokenUsage(
+        prompt_tokens=50, completion_tokens=25, cached_tokens=60
+    )
+    assert usage.total_tokens == sum(reported.total_tokens for reported in billed)
+
+
+def test_gemini_usage_counts_thoughts_as_completion_tokens():
+    client = GeminiLLMClient("gemini-2.5-flash", api_key="test-key")
+    response = GenerateContentResponse.from_response(
+        protos.GenerateContentResponse(
+            usage_metadata={
+                "prompt_token_count": 100,
+                "cached_content_token_count": 60,
+                "candidates_token_count": 20,
+                # 30 thought tokens are only reflected in the total.
+                "total_token_count": 150,
+            }
+        )
+    )
+
+    client._record_usage(response)
+
+    usage = client.get_token_usage()
+    assert usage == TokenUsage(
+        prompt_tokens=40, completion_tokens=50, cached_tokens=60
+    )
+    assert usage.total_tokens == response.usage_metadata.total_token_count
+
+
+def test_json_calls_follow_routing_only_when_all_fields_agree():
+    routes = {
+        OptimizationStep.ROLE: "mini",
+        OptimizationStep.CONTEXT: "mini",
+        OptimizationStep.AUDIENCE: "nano",
+    }
+
+    assert _shared_route(routes, ["role", "context"]) == "mini"
+    assert _shared_route(routes, ["role", "audience"]) is None
+    assert _shared_route(routes, ["role", "harmonization"]) is None
+
+
+class StubBatchAPI:
+    """Offline stand-in for the files and batches endpoints of ``OpenAI``."""
+
+    def __init__(self, contents: dict[str, str], statuses: list[str]) -> None:
+        self.contents = contents
+        self.statuses = statuses
+        self.cancelled: list[str] = []
+        self.uploaded = b""
+        self.files = SimpleNamespace(create=self._upload, content=self._download)
+        self.batches = SimpleNamespace(
+            create=lambda **_: self._batch(),
+            retrieve=lambda _: self._batch(),
+            cancel=self.cancelled.append,
+        )
+
+    def _upload(self, *, file: tuple[str, bytes], purpose: str) -> SimpleNamespace:
+        self.uploaded = file[1]
+        return SimpleNamespace(id="file-in")
+
+    def _batch(self) -> SimpleNamespace:
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return SimpleNamespace(id="batch-1", status=status, output_file_id="file-out")
+
+    def _download(self, file_id: str) -> SimpleNamespace:
+        # Results arrive in completion order, not submission order.
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "response": {
+                        "status_code": 200,
+                        "body": _completion(None).model_dump()
+                        | {
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "finish_reason": "stop",
+                                    "message": {
+                                        "role": "assistant",
+                                        "content": content,
+                                    },
+                                }
+                            ]
+                        },
+                    },
+                }
+            )
+            for custom_id, content in reversed(self.contents.items())
+        ]
+        return SimpleNamespace(text="\n".join(lines))
+
+
+def _batch_client(api: StubBatchAPI) -> OpenAILLMClient:
+    client = OpenAILLMClient("gpt-5", api_key="test-key")
+    client._client = api  # type: ignore[assignment]
+    client.batch_poll_interval = 0.0
+    return client
+
+
+def test_generate_batch_returns_responses_in_submission_order():
+    api = StubBatchAPI({"0": "role", "1": "context"}, ["in_progress", "completed"])
+    client = _batch_client(api)
+
+    responses = client.generate_batch(
+        ["p0", "p1"], [OptimizationStep.ROLE, OptimizationStep.CONTEXT]
+    )
+
+    assert responses == ["role", "context"]
+    assert [
+        json.loads(line)["custom_id"] for line in api.uploaded.splitlines()
+    ] == ["0", "1"]
+
+
+def test_generate_batch_raises_for_missing_responses():
+    client = _batch_client(StubBatchAPI({"0": "role"}, ["completed"]))
+
+    with pytest.raises(RuntimeError, match="requests 1"):
+        client.generate_batch(
+            ["p0", "p1"], [OptimizationStep.ROLE, OptimizationStep.CONTEXT]
+        )
+
+
+def test_generate_batch_cancels_after_max_wait():
+    api = StubBatchAPI({}, ["in_progress"])
+    client = _batch_client(api)
+    client.batch_max_wait = 0.0
+
+    with pytest.raises(TimeoutError):
+        client.generate_batch(["p0"], [OptimizationStep.ROLE])
+    assert api.cancelled == ["batch-1"]
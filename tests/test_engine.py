@@ -0,0 +1,74 @@
+import asyncio
+from collections.abc import Sequence
+
+from prompt_optimizer.domain.models import OptimizationStep, PromptSession
+from prompt_optimizer.llm.client import MockLLMClient
+from prompt_optimizer.prompts.manager import PromptManager
+from prompt_optimizer.state_machine.engine import PromptOptimizerEngine
+
+STEPS = [OptimizationStep.ROLE, OptimizationStep.CONTEXT, OptimizationStep.OUTPUT]
+
+
+class TruncatedJSONClient(MockLLMClient):
+    """Answers batched requests with only the first requested field."""
+
+    def generate_json(
+        self, prompt: str, fields: Sequence[str], *, bypass_cache: bool = False
+    ) -> str:
+        return super().generate_json(prompt, fields[:1])
+
+
+def test_process_all_steps_uses_one_batched_call():
+    client = MockLLMClient()
+    engine = PromptOptimizerEngine(prompt_manager=PromptManager(), client=client)
+
+    results = engine.process_all_steps(
+        session=PromptSession(), user_prompt="draft", steps=STEPS
+    )
+
+    assert [result.step for result in results] == STEPS
+    assert results[1].summary == client.generate("draft", step=STEPS[1])
+
+
+def test_aprocess_all_steps_falls_back_for_missing_steps():
+    engine = PromptOptimizerEngine(
+        prompt_manager=PromptManager(), client=TruncatedJSONClient()
+    )
+
+    results = asyncio.run(
+        engine.aprocess_all_steps(
+            session=PromptSession(), user_prompt="draft", steps=STEPS
+        )
+    )
+
+    assert [result.step for result in results] == STEPS
+    assert "Dimensions (key: label)" in results[0].details["prompt"]
+    assert "Dimension: Output" in results[2].details["prompt"]
+
+
+def test_aprocess_steps_preserves_step_order():
+    engine = PromptOptimizerEngine(
+        prompt_manager=PromptManager(), client=MockLLMClient()
+    )
+
+    results = asyncio.run(
+        engine.aprocess_steps(session=PromptSession(), steps=STEPS, user_prompt="draft")
+    )
+
+    assert [result.step for result in results] == STEPS
+
+
+def test_process_step_streams_chunks_to_callback():
+    engine = PromptOptimizerEngine(
+        prompt_manager=PromptManager(), client=MockLLMClient()
+    )
+    chunks: list[str] = []
+
+    result = engine.process_step(
+        session=PromptSession(),
+        step=OptimizationStep.ROLE,
+        user_prompt="draft",
+        on_chunk=chunks.append,
+    )
+
+    assert "".join(chunks) == result.summary
@@ -0,0 +1,25 @@
+import asyncio
+
+from prompt_optimizer.domain.models import OptimizationStep, PromptSession
+from prompt_optimizer.llm.client import MockLLMClient
+from prompt_optimizer.pipelines.harmonizer import GlobalHarmonizer
+from prompt_optimizer.prompts.manager import PromptManager
+
+
+def test_ensemble_records_the_selected_candidate():
+    harmonizer = GlobalHarmonizer(PromptManager(), MockLLMClient())
+    seen: list[int] = []
+
+    def pick_last(candidates):
+        seen.append(len(candidates))
+        return candidates[-1]
+
+    session = asyncio.run(
+        harmonizer.aharmonize_ensemble(PromptSession(), n=3, selector=pick_last)
+    )
+
+    assert seen == [3]
+    assert session.current_step == OptimizationStep.FINAL_OUTPUT
+    assert session.parameters[OptimizationStep.FINAL_OUTPUT.value].startswith(
+        "[MOCK]"
+    )
@@ -0,0 +1,79 @@
+from prompt_optimizer.domain.models import OptimizationStep, PromptSession
+from prompt_optimizer.prompts.manager import PromptManager
+
+
+def test_render_matches_str_format_and_keeps_braces_in_values():
+    manager = PromptManager()
+    session = PromptSession()
+    session.set_parameter("role", "{editor}")
+
+    rendered = manager.render_analyze_step(
+        step=OptimizationStep.ROLE,
+        user_prompt="Write {a} poem",
+        session=session,
+        feedback="shorter",
+    )
+
+    assert rendered == manager.analyze_step_feedback_template.format(
+        step_label=OptimizationStep.ROLE.label,
+        user_prompt="Write {a} poem",
+        parameters='{"role":"{editor}"}',
+        feedback="shorter",
+    )
+
+
+def test_blank_feedback_omits_the_guidance_section():
+    manager = PromptManager()
+
+    rendered = manager.render_analyze_step(
+        step=OptimizationStep.ROLE,
+        user_prompt="draft",
+        session=PromptSession(),
+        feedback="  ",
+    )
+
+    assert "guidance" not in rendered
+    assert rendered.endswith("{}")
+
+
+def test_parameters_are_compacted_oldest_first():
+    manager = PromptManager()
+    long_value = "First sentence. " + "detail " * 200
+
+    compact = manager._compact_parameters(
+        {
+            "empty": "  ",
+            **{f"step_{index}": long_value for index in range(6)},
+        }
+    )
+
+    assert "empty" not in compact
+    assert compact["step_0"] == "First sentence."
+    assert len(compact["step_5"]) == manager.max_chars_per_parameter
+    assert sum(len(key) + len(value) for key, value in compact.items()) <= (
+        manager.max_parameters_chars
+    )
+
+
+def test_harmonize_render_is_reused_until_the_session_changes():
+    manager = PromptManager()
+    session = PromptSession()
+
+    first = manager.render_global_harmonize(session)
+    assert manager.render_global_harmonize(session) is first
+
+    session.set_parameter("role", "editor")
+
+    assert '"role":"editor"' in manager.render_global_harmonize(session)
+
+
+def test_parameters_are_reencoded_after_a_change():
+    manager = PromptManager()
+    session = PromptSession()
+
+    first = manager.render_analyze_step(OptimizationStep.ROLE, "draft", session)
+    session.set_parameter("role", "editor")
+    second = manager.render_analyze_step(OptimizationStep.ROLE, "draft", session)
+
+    assert '"role":"editor"' not in first
+    assert '"role":"editor"' in second
@@ -0,0 +1,83 @@
+from prompt_optimizer.domain.models import (
+    AnalysisResult,
+    OptimizationStep,
+    PromptSession,
+)
+
+
+def _record_twice(session: PromptSession) -> AnalysisResult:
+    first = AnalysisResult(step=OptimizationStep.ROLE, summary="first")
+    second = AnalysisResult(step=OptimizationStep.ROLE, summary="second")
+    session.record_analysis(first)
+    session.record_analysis(second)
+    return second
+
+
+def test_record_analysis_keeps_only_latest_result_by_default():
+    session = PromptSession()
+
+    latest = _record_twice(session)
+
+    assert session.last_analysis == latest
+    assert session.analysis_history == []
+    assert session.completed_steps == [OptimizationStep.ROLE]
+
+
+def test_record_analysis_keeps_history_when_requested():
+    session = PromptSession(keep_full_history=True)
+
+    latest = _record_twice(session)
+
+    assert [result.summary for result in session.analysis_history] == [
+        "first",
+        "second",
+    ]
+    assert session.last_analysis == latest
+
+
+def test_parameter_writes_bump_the_version():
+    session = PromptSession()
+    versions = [session.version]
+
+    session.parameters["role"] = "editor"
+    versions.append(session.version)
+    session.set_parameter("role", "writer")
+    versions.append(session.version)
+    session.parameters.update(context="docs")
+    versions.append(session.version)
+    session.parameters = {"role": "critic"}
+    versions.append(session.version)
+    session.parameters.pop("role")
+    versions.append(session.version)
+
+    assert versions == sorted(set(versions))
+
+
+def test_copies_track_their_own_parameters():
+    session = PromptSession(parameters={"role": "old"})
+    copy = session.model_copy(update={"parameters": {"role": "new"}})
+    version = copy.version
+
+    copy.parameters["role"] = "newer"
+
+    assert copy.version > version
+    assert '"newer"' in copy.model_dump_json()
+    assert session.parameters == {"role": "old"}
+
+
+def test_equality_ignores_version_bookkeeping():
+    session = PromptSession()
+    session.set_parameter("role", "editor")
+
+    restored = PromptSession.model_validate_json(session.model_dump_json())
+
+    assert restored == session
+    assert restored.version != session.version
+    restored.parameters["role"] = "writer"
+    assert restored != session
+
+
+def test_history_setting_is_not_serialized():
+    session = PromptSession(keep_full_history=True)
+
+    assert "keep_full_history" not in session.model_dump_json()